@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third Party
     'allauth',
@@ -69,13 +70,22 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [str(BASE_DIR.joinpath('templates'))],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process. The development server 
+            # still reloads them when they change.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.date_periods',
+                'equipment.context_processors.pending_booking',
             ],
         },
     },
@@ -113,6 +123,40 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# A small in-process LRU (see core.cache.TieredCache) in front of a cache 
+# shared by every worker. The file based default is per host, so production 
+# must configure a shared backend such as Redis or Memcached, 
+# i.e. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and 
+# CACHE_LOCATION=redis://cache:6379/0
+
+# Production
+if DEBUG == False:
+    SHARED_CACHE = {
+        'BACKEND': env("CACHE_BACKEND"),
+        'LOCATION': env("CACHE_LOCATION"),
+    }
+
+else:
+    SHARED_CACHE = {
+        'BACKEND': env("CACHE_BACKEND", default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': env("CACHE_LOCATION", default=str(BASE_DIR.joinpath('cache', 'shared'))),
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_TIMEOUT': env.int("CACHE_LOCAL_TIMEOUT", default=5),
+            'LOCAL_MAX_ENTRIES': env.int("CACHE_LOCAL_MAX_ENTRIES", default=500),
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -158,6 +202,9 @@ STATICFILES_FINDERS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = str(BASE_DIR.joinpath('media'))
 
+# Rendered invoice PDFs, cached by booking and last update
+INVOICE_PDF_CACHE_DIR = str(BASE_DIR.joinpath('cache', 'invoices'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -0,0 +1,9 @@
+from .settings import *  # noqa
+
+
+# Tests get an in-memory cache of their own, one per test process, so they 
+# neither read from nor clear the development cache
+CACHES['shared'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'tests',
+}
@@ -0,0 +1,165 @@
+import threading, time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    Two tier cache: a small in-process LRU in front of a cache shared by every
+    worker and web node, i.e. Redis or Memcached. Reads are served from the
+    process while fresh, and writes go through to the shared cache. Entries
+    are held in the process for at most LOCAL_TIMEOUT seconds, so changes
+    made by other processes are seen within that time.
+
+    Options:
+        SHARED_CACHE: alias of the shared cache in CACHES.
+        LOCAL_TIMEOUT: seconds entries are held in the process.
+        LOCAL_MAX_ENTRIES: entries held in the process, least recently used
+        first out.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 500)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+
+    # In-process tier
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return _MISSING
+
+            self._local.move_to_end(key)
+            return value
+
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        local_timeout = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+
+        with self._lock:
+            if local_timeout <= 0:
+                self._local.pop(key, None)
+                return
+
+            self._local[key] = (time.monotonic() + local_timeout, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+
+    # Cache API
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+
+        value = self._local_get(local_key)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            self._local_set(local_key, value)
+
+        return value
+
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing:
+            for key, value in self.shared.get_many(missing, version=version).items():
+                self._local_set(self.make_and_validate_key(key, version=version), value)
+                found[key] = value
+
+        return found
+
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return added
+
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        try:
+            value = self.shared.incr(key, delta, version=version)
+        except ValueError:
+            self._local_delete(local_key)
+            raise
+
+        self._local_set(local_key, value)
+        return value
+
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        return self._local_get(local_key) is not _MISSING or self.shared.has_key(key, version=version)
+
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=version)
+
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
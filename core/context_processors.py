@@ -0,0 +1,28 @@
+from django.utils.functional import lazy
+
+from .utils import get_date_periods
+
+
+DATE_PERIODS = (
+    'today', 
+    'yesterday', 
+    'week_start', 
+    'week_end', 
+    'last_week_start', 
+    'last_week_end', 
+    'month_start', 
+    'month_end', 
+    'year_start',
+)
+
+
+def date_periods(request):
+    """
+    Adds the dates from get_date_periods() to every template, looked up only 
+    if the template uses them.
+    """
+
+    return {
+        name: lazy(lambda name=name: get_date_periods()[name], str)()
+        for name in DATE_PERIODS
+    }
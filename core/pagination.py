@@ -0,0 +1,241 @@
+import base64, binascii, hashlib, json, math
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def paginate(request, queryset, per_page, ordering):
+    """
+    Returns the requested page of a queryset. Pages are keyset paginated when 
+    the request opts in with a `cursor` parameter, and offset paginated by 
+    `page` number otherwise.
+    """
+
+    if CursorPaginator.page_param in request.GET:
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        return paginator.page(request.GET.get(CursorPaginator.page_param))
+
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    page = request.GET.get('page')
+
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
+class CursorPaginator:
+    """
+    Keyset paginator, which seeks each page from the ordering values of the
+    page before it rather than with OFFSET, so deep pages cost the same as
+    the first. Mirrors the parts of Django's Paginator used by templates.
+    The total count is cached per query, rather than counted per request.
+    """
+
+    page_param = 'cursor'
+    count_timeout = 60*5 #5 mins, in secs
+
+
+    def __init__(self, object_list, per_page, ordering):
+        self.object_list = object_list
+        self.per_page = per_page
+
+        # The primary key is appended as a tie-breaker, so the ordering is total
+        self.ordering = list(ordering) + ['id']
+
+
+    @cached_property
+    def count(self):
+        try:
+            query_hash = hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+        except EmptyResultSet:
+            # The query can never match, i.e. filter(id__in=[]), so has no SQL
+            return 0
+
+        return cache.get_or_set(
+            f'cursor_paginator_count_{query_hash}',
+            self.object_list.count,
+            timeout=self.count_timeout,
+        )
+
+
+    @cached_property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+
+    @property
+    def last_page(self):
+        return self.encode_cursor('last', self.num_pages)
+
+
+    def encode_cursor(self, direction, number, values=None):
+        data = json.dumps({'d': direction, 'p': number, 'v': values})
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+    def decode_cursor(self, cursor):
+        """
+        Returns (direction, number, values) for the given cursor. Missing or
+        malformed cursors return the first page.
+        """
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            direction, number, values = data['d'], int(data['p']), data['v']
+        except (AttributeError, binascii.Error, KeyError, TypeError, ValueError):
+            return 'next', 1, None
+
+        if direction not in ('next', 'previous', 'last') or number < 1:
+            return 'next', 1, None
+
+        if values is not None and len(values) != len(self.ordering):
+            return 'next', 1, None
+
+        return direction, number, values
+
+
+    def get_values(self, obj):
+        """
+        Returns the ordering values for an object, as strings.
+        """
+
+        return [
+            obj._meta.get_field(field.lstrip('-')).value_to_string(obj)
+            for field in self.ordering
+        ]
+
+
+    def seek(self, values, reverse=False):
+        """
+        Returns a filter for objects after the given ordering values, or
+        before them if reversed.
+        """
+
+        query = Q()
+
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            clause = Q(**{f"{field.lstrip('-')}__{lookup}": values[index]})
+
+            for previous_field, previous_value in zip(self.ordering[:index], values):
+                clause &= Q(**{previous_field.lstrip('-'): previous_value})
+
+            query |= clause
+
+        return query
+
+
+    def reverse_ordering(self):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        ]
+
+
+    def page(self, cursor):
+        """
+        Returns the page for the given cursor.
+        """
+
+        direction, number, values = self.decode_cursor(cursor)
+
+        if direction == 'last':
+            number = self.num_pages
+            remainder = self.count - (number - 1) * self.per_page
+            object_list = list(
+                self.object_list.order_by(*self.reverse_ordering())[:max(remainder, 0)]
+            )[::-1]
+            has_previous, has_next = number > 1, False
+
+        elif direction == 'previous' and values:
+            object_list = list(
+                self.object_list.filter(self.seek(values, reverse=True)
+                ).order_by(*self.reverse_ordering())[:self.per_page + 1]
+            )
+            has_previous, has_next = len(object_list) > self.per_page, True
+            object_list = object_list[:self.per_page][::-1]
+
+        else:
+            queryset = self.object_list.order_by(*self.ordering)
+            if values:
+                queryset = queryset.filter(self.seek(values))
+
+            object_list = list(queryset[:self.per_page + 1])
+            has_previous, has_next = values is not None, len(object_list) > self.per_page
+            object_list = object_list[:self.per_page]
+
+        # Cursors for neighbouring pages are taken from the first / last object
+        previous_cursor = next_cursor = None
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(
+                'previous', max(number - 1, 1), self.get_values(object_list[0])
+            )
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(
+                'next', number + 1, self.get_values(object_list[-1])
+            )
+
+        return CursorPage(object_list, number, self, previous_cursor, next_cursor)
+
+
+class CursorPage:
+    """
+    A page of results from a CursorPaginator. The previous / next page
+    "numbers" are the cursors for those pages.
+    """
+
+    def __init__(self, object_list, number, paginator, previous_cursor, next_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+
+    def __repr__(self):
+        return f'<Page {self.number} of {self.paginator.num_pages}>'
+
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+    def next_page_number(self):
+        return self.next_cursor
+
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
@@ -0,0 +1,108 @@
+import zlib
+
+
+# A4, in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+
+class PDFDocument:
+    """
+    Minimal PDF writer for plain text documents, i.e. invoices. Text is set in
+    the standard Helvetica fonts, which every PDF reader provides, so no fonts
+    are embedded. Coordinates are in points from the bottom left of the page.
+    """
+
+    fonts = {
+        'regular': ('F1', 'Helvetica'),
+        'bold': ('F2', 'Helvetica-Bold'),
+    }
+
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+
+
+    def add_page(self):
+        self.pages.append([])
+
+
+    def text(self, x, y, value, size=10, font='regular'):
+        name, _ = self.fonts[font]
+        self.pages[-1].append(
+            f'BT /{name} {size} Tf {x:.2f} {y:.2f} Td ({self.escape(value)}) Tj ET'
+        )
+
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.pages[-1].append(f'{width} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S')
+
+
+    @staticmethod
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+    def render(self):
+        """
+        Returns the document as PDF bytes.
+        """
+
+        if not self.pages:
+            self.add_page()
+
+        objects = []
+
+        def add_object(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add_object(None)
+        pages = add_object(None)
+        font_refs = {
+            name: add_object(
+                f'<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} '
+                f'/Encoding /WinAnsiEncoding >>'.encode()
+            )
+            for name, base_font in self.fonts.values()
+        }
+        resources = ' '.join(f'/{name} {ref} 0 R' for name, ref in font_refs.items())
+
+        page_refs = []
+        for operations in self.pages:
+            content = zlib.compress('\n'.join(operations).encode('cp1252', errors='replace'))
+            stream = add_object(
+                f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode()
+                + content + b'\nendstream'
+            )
+            page_refs.append(add_object(
+                f'<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                f'/Resources << /Font << {resources} >> >> /Contents {stream} 0 R >>'.encode()
+            ))
+
+        objects[catalog - 1] = f'<< /Type /Catalog /Pages {pages} 0 R >>'.encode()
+        objects[pages - 1] = (
+            f"<< /Type /Pages /Kids [{' '.join(f'{ref} 0 R' for ref in page_refs)}] "
+            f'/Count {len(page_refs)} >>'.encode()
+        )
+        info = add_object(
+            b'<< /Title (' + self.escape(self.title).encode('cp1252', errors='replace') + b') >>'
+        )
+
+        document = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(document))
+            document += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+
+        xref = len(document)
+        document += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+        for offset in offsets:
+            document += f'{offset:010d} 00000 n \n'.encode()
+        document += (
+            f'trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n'
+            f'startxref\n{xref}\n%%EOF\n'
+        ).encode()
+
+        return bytes(document)
@@ -1,3 +1,128 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from .context_processors import date_periods
+from .utils import build_date_periods, get_date_periods
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {'SHARED_CACHE': 'shared', 'LOCAL_TIMEOUT': 60, 'LOCAL_MAX_ENTRIES': 2},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-cache-tests',
+    },
+})
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+
+
+    def test_reads_are_served_from_the_process(self):
+        """
+        Tests values are written through to the shared cache, and then read 
+        from the process until they are changed through it.
+        """
+
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+
+        # Changes made directly in the shared cache, i.e. by another worker, 
+        # are not seen until the local entry expires
+        self.shared.set('key', 'changed')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+        # Misses are read through
+        self.shared.set_many({'one': 1, 'two': 2})
+        self.assertEqual(self.cache.get_many(['one', 'two', 'three']), {'one': 1, 'two': 2})
+
+        self.assertEqual(self.cache.incr('one'), 2)
+        self.assertEqual(self.shared.get('one'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('three')
+
+
+    def test_least_recently_used_are_evicted(self):
+        """
+        Tests the process holds no more than its maximum entries, dropping 
+        the least recently used.
+        """
+
+        self.cache.set_many({'one': 1, 'two': 2})
+        self.cache.get('one')
+        self.cache.set('three', 3)
+
+        self.shared.set_many({'one': 'shared', 'two': 'shared', 'three': 'shared'})
+        self.assertEqual(
+            self.cache.get_many(['one', 'two', 'three']), 
+            {'one': 1, 'two': 'shared', 'three': 3},
+        )
+
+
+class DatePeriodsTest(SimpleTestCase):
+
+    def test_periods_are_built_once_a_day(self):
+        """
+        Tests the periods are memoized on the day, and copied so callers 
+        cannot change the memoized dict.
+        """
+
+        build_date_periods.cache_clear()
+        periods = get_date_periods()
+        periods['today'] = 'changed'
+
+        self.assertEqual(get_date_periods()['today'], timezone.localdate().isoformat())
+        self.assertEqual(build_date_periods.cache_info().misses, 1)
+        self.assertEqual(build_date_periods.cache_info().hits, 1)
+
+
+    def test_periods_use_the_local_date(self):
+        """
+        Tests today is the day in Europe/London, not UTC, just after midnight 
+        in summer time.
+        """
+
+        now = datetime(2024, 6, 30, 23, 30, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            periods = get_date_periods()
+
+        self.assertEqual(periods['today'], '2024-07-01')
+        self.assertEqual(periods['yesterday'], '2024-06-30')
+        self.assertEqual(periods['month_start'], '2024-07-01')
+        self.assertEqual(periods['month_end'], '2024-07-31')
+
+
+    def test_periods_for_a_day(self):
+        periods = build_date_periods(date(2024, 2, 14))
+
+        self.assertEqual(periods['week_start'], '2024-02-12')
+        self.assertEqual(periods['week_end'], '2024-02-18')
+        self.assertEqual(periods['last_week_start'], '2024-02-05')
+        self.assertEqual(periods['last_week_end'], '2024-02-11')
+        self.assertEqual(periods['month_end'], '2024-02-29')
+        self.assertEqual(periods['year_start'], '2024-01-01')
+
+
+    def test_context_processor_is_lazy(self):
+        """
+        Tests the periods are not worked out until a template uses them.
+        """
+
+        with mock.patch('core.context_processors.get_date_periods', wraps=get_date_periods) as periods:
+            context = date_periods(RequestFactory().get('/'))
+            periods.assert_not_called()
+
+            self.assertEqual(str(context['today']), timezone.localdate().isoformat())
+            periods.assert_called_once()
@@ -1,14 +1,29 @@
+import csv
 from datetime import timedelta
+from functools import lru_cache
+from itertools import chain
 
+from django.http import StreamingHttpResponse
 from django.utils import timezone, dateformat
 
 
 def get_date_periods():
     """
-    Returns dict of assorted useful dates.
+    Returns dict of assorted useful dates, for today in the current timezone 
+    (Europe/London). The dates only change at midnight, so they are built 
+    once a day.
+    """
+
+    return dict(build_date_periods(timezone.localdate()))
+
+
+@lru_cache(maxsize=2)
+def build_date_periods(today):
+    """
+    Returns dict of assorted useful dates for the given day, memoized per 
+    day. Use get_date_periods() for today's.
     """
 
-    today = timezone.now().date()
     yesterday = dateformat.format(today - timedelta(1), 'Y-m-d')
     base_date = dateformat.format(today, 'Y-m-d').split('-')
     current_week = today.isocalendar()
@@ -45,4 +60,30 @@ def convert_duration_to_hours(days, seconds):
     """
     
     hours = (days * 24) + seconds / 3600
-    return hours
\ No newline at end of file
+    return hours
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer, which returns each written row rather than 
+    storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv_response(header, rows, filename):
+    """
+    Returns a response streaming the header and rows as a CSV attachment, 
+    without holding them in memory.
+    """
+
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in chain([header], rows)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    return response
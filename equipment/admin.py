@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Category, Item, Manufacturer, EquipmentBooking
+from .models import Category, Item, Kit, Manufacturer, EquipmentBooking
 
 
 class CustomItemAdmin(admin.ModelAdmin):
@@ -10,6 +10,14 @@ class CustomItemAdmin(admin.ModelAdmin):
     ordering = ('created_at',)
 
 
+class CustomKitAdmin(admin.ModelAdmin):
+    model = Kit
+    list_display = ('name', 'created_at', 'updated_at')
+    search_fields = ('name',)
+    filter_horizontal = ('items',)
+    ordering = ('name',)
+
+
 class CustomEquipmentBookingAdmin(admin.ModelAdmin):
     model = Item
     list_display = ('job_reference', 'created_at', 'created_by')
@@ -19,5 +27,6 @@ class CustomEquipmentBookingAdmin(admin.ModelAdmin):
 
 admin.site.register(Category)
 admin.site.register(Item, CustomItemAdmin)
+admin.site.register(Kit, CustomKitAdmin)
 admin.site.register(Manufacturer)
 admin.site.register(EquipmentBooking, CustomEquipmentBookingAdmin)
\ No newline at end of file
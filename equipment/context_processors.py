@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from .utils import get_pending_booking
+
+
+def pending_booking(request):
+    """
+    Adds the current user's pending booking to every template, resolved only 
+    if the template uses it, and shared with the view through 
+    get_pending_booking().
+    """
+
+    return {
+        'pending_booking': SimpleLazyObject(lambda: get_pending_booking(request)),
+    }
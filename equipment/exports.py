@@ -0,0 +1,121 @@
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.utils import timezone
+
+from core.utils import stream_csv_response
+from .models import EquipmentBookingItem
+
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_items_csv(queryset, booking=None):
+    """
+    Streams the given items as CSV, with their depreciated value and 
+    availability, either for the given booking's period or right now.
+    """
+
+    period = booking.period if booking else None
+    booked_items_subquery = EquipmentBookingItem.objects.active().filter(item=OuterRef('pk'))
+
+    if period:
+        booked_items_subquery = booked_items_subquery.overlapping(period)
+    else:
+        booked_items_subquery = booked_items_subquery.filter(period__contains=timezone.now())
+
+    items = queryset.with_depreciated_value(
+        ).annotate(booked=Exists(booked_items_subquery)
+        ).order_by('created_at'
+        ).values_list(
+            'barcode',
+            'name',
+            'category__name',
+            'manufacturer__name',
+            'model_number',
+            'serial_number',
+            'status',
+            'assigned_to__email',
+            'purchase_date',
+            'purchase_cost',
+            'depreciated_value',
+            'hire_day_rate',
+            'service_due_date',
+            'booked',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    header = [
+        'Barcode',
+        'Name',
+        'Category',
+        'Manufacturer',
+        'Model Number',
+        'Serial Number',
+        'Status',
+        'Assigned To',
+        'Purchase Date',
+        'Purchase Cost',
+        'Depreciated Value',
+        'Hire Day Rate',
+        'Service Due Date',
+        'Available',
+    ]
+
+    def rows():
+        for (barcode, name, category, manufacturer, model_number, serial_number, status, 
+            assigned_to, purchase_date, purchase_cost, depreciated_value, hire_day_rate, 
+            service_due_date, booked) in items:
+            yield [
+                barcode,
+                name,
+                category,
+                manufacturer,
+                model_number,
+                serial_number,
+                status,
+                assigned_to,
+                purchase_date,
+                purchase_cost,
+                round(depreciated_value, 2),
+                hire_day_rate,
+                service_due_date,
+                assigned_to is None and not booked,
+            ]
+
+    return stream_csv_response(header, rows(), f'items-{timezone.now():%Y-%m-%d}.csv')
+
+
+def export_bookings_csv(queryset):
+    """
+    Streams the given bookings as CSV, with their item counts and day rate 
+    totals.
+    """
+
+    bookings = queryset.annotate(
+            item_count=Count('booking_items'),
+            day_rate_total=Sum('booking_items__value', default=0.0),
+        ).order_by('-start_at', 'created_at'
+        ).values_list(
+            'job_reference',
+            'job_number',
+            'status',
+            'start_at',
+            'end_at',
+            'duration',
+            'created_by__email',
+            'item_count',
+            'day_rate_total',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    header = [
+        'Job Reference',
+        'Job Number',
+        'Status',
+        'Start',
+        'End',
+        'Duration',
+        'Created By',
+        'Items',
+        'Day Rate Total',
+    ]
+
+    return stream_csv_response(header, bookings, f'bookings-{timezone.now():%Y-%m-%d}.csv')
@@ -3,7 +3,7 @@ import datetime
 import django_filters
 from django.db.models import Q
 
-from equipment.models import Item, EquipmentBooking
+from equipment.models import Item, EquipmentBooking, Category, Manufacturer
 
 
 class EquipmentBookingFilter(django_filters.FilterSet):
@@ -58,11 +58,23 @@ class ItemFilter(django_filters.FilterSet):
 
     def custom_search_filter(self, queryset, name, value):
 
+        # Matching categories / manufacturers are resolved up front, so that 
+        # every condition is on the item table and can use its own index.
+        category_ids = Category.objects.filter(
+            name__icontains=value
+        ).values_list('id', flat=True)
+
+        manufacturer_ids = Manufacturer.objects.filter(
+            name__iexact=value
+        ).values_list('id', flat=True)
+
         return queryset.filter(
-            Q(barcode__iexact=value) |
+            Q(barcode=value) |
             Q(name__icontains=value) |
-            Q(category__name__icontains=value) |
-            Q(manufacturer__name__iexact=value)
+            Q(category__in=list(category_ids)) |
+            Q(manufacturer__in=list(manufacturer_ids)) |
+            Q(model_number__trigram_word_similar=value) |
+            Q(serial_number__trigram_word_similar=value)
         )
     
 
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
-from .models import Item, EquipmentBooking
+from .models import Category, Manufacturer, Item, EquipmentBooking
 from core.forms import DateInput, DateTimeInput
 
 
@@ -67,6 +67,68 @@ class CreateUpdateItemForm(forms.ModelForm):
         self.fields['manufacturer'].required = True
 
 
+class ImportItemForm(CreateUpdateItemForm):
+    """
+    Form used to validate a single row of an item import. Categories and 
+    manufacturers are given by name and resolved by the importer, and barcodes 
+    are checked for uniqueness a batch at a time, so validating a row does not 
+    query the database.
+    """
+
+    class Meta(CreateUpdateItemForm.Meta):
+        fields = [
+            field for field in CreateUpdateItemForm.Meta.fields
+            if field not in ('category', 'manufacturer')
+        ]
+
+
+    def __init__(self, *args, **kwargs):
+        forms.ModelForm.__init__(self, *args, **kwargs)
+
+
+    def validate_unique(self):
+        pass
+
+
+class UploadItemsForm(forms.Form):
+    """
+    Form used to upload a CSV file of items to import.
+    """
+
+    file = forms.FileField(
+        label='CSV File',
+        help_text='Required. One item per row, with a header row of field names. Categories and manufacturers are given by name.',
+    )
+
+
+class ItemAvailabilityForm(forms.Form):
+    """
+    Form used to search for a number of free items of a category and / or 
+    manufacturer, for a booking window.
+    """
+
+    category = forms.ModelChoiceField(required=False, queryset=Category.objects.all())
+    manufacturer = forms.ModelChoiceField(required=False, queryset=Manufacturer.objects.all())
+    start_at = forms.DateTimeField(required=False)
+    end_at = forms.DateTimeField(required=False)
+    quantity = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if not cleaned_data.get('category') and not cleaned_data.get('manufacturer'):
+            raise forms.ValidationError('A category or manufacturer is required.')
+
+        start_at, end_at = cleaned_data.get('start_at'), cleaned_data.get('end_at')
+        if start_at and end_at and end_at <= start_at:
+            raise forms.ValidationError('The window end must be after its start.')
+
+        cleaned_data['quantity'] = cleaned_data.get('quantity') or 1
+
+        return cleaned_data
+
+
 class AssignItemForm(forms.ModelForm):
     """
     Form used to assign a user to piece of equipment.
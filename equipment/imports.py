@@ -0,0 +1,148 @@
+from django.db import IntegrityError, transaction
+
+from .forms import ImportItemForm
+from .models import Category, Item, Manufacturer
+
+
+def import_items(rows, created_by=None, batch_size=500, dry_run=False):
+    """
+    Validates and creates items from an iterable of row dicts, i.e. a 
+    csv.DictReader. Rows are consumed as a stream and inserted with 
+    bulk_create a batch at a time, inside a single transaction. Returns the 
+    number of items created, and a list of (line number, errors) for rows 
+    that were skipped.
+    """
+
+    # Name lookups, resolved in memory rather than per row
+    categories = {
+        name.casefold(): pk for pk, name in Category.objects.values_list('id', 'name')
+    }
+    manufacturers = {
+        name.casefold(): pk for pk, name in Manufacturer.objects.values_list('id', 'name')
+    }
+    service_intervals = {
+        label.casefold(): str(value) for value, label in Item.SERVICE_INTERVAL_CHOICES
+    }
+
+    created = 0
+    errors = []
+    batch = []
+    used_barcodes = set()
+
+    with transaction.atomic():
+
+        # Line 1 is the header row
+        for line_number, row in enumerate(rows, start=2):
+            row = {
+                key.strip(): (value or '').strip() 
+                for key, value in row.items() if key
+            }
+            row_errors = []
+
+            category_id = categories.get(row.get('category', '').casefold())
+            if not category_id:
+                row_errors.append(f"category: Unknown category '{row.get('category', '')}'.")
+
+            manufacturer_id = manufacturers.get(row.get('manufacturer', '').casefold())
+            if not manufacturer_id:
+                row_errors.append(f"manufacturer: Unknown manufacturer '{row.get('manufacturer', '')}'.")
+
+            # Service intervals can be given by label, i.e. '3 Months'
+            interval = row.get('service_interval_period', '')
+            row['service_interval_period'] = service_intervals.get(interval.casefold(), interval)
+
+            form = ImportItemForm(row)
+            if not form.is_valid():
+                row_errors += [
+                    f'{field}: {error}' 
+                    for field, field_errors in form.errors.items() 
+                    for error in field_errors
+                ]
+
+            if row_errors:
+                errors.append((line_number, row_errors))
+                continue
+
+            item = form.save(commit=False)
+            item.category_id = category_id
+            item.manufacturer_id = manufacturer_id
+            item.created_by = created_by
+
+            if item.last_service_date and item.service_interval_period:
+                item.service_due_date = item.last_service_date + item.service_interval_period
+
+            batch.append((line_number, item))
+
+            if len(batch) >= batch_size:
+                created += _create_batch(batch, errors, dry_run, used_barcodes)
+                batch = []
+
+        if batch:
+            created += _create_batch(batch, errors, dry_run, used_barcodes)
+
+    return created, sorted(errors)
+
+
+def _create_batch(batch, errors, dry_run, used_barcodes):
+    """
+    Creates a batch of validated items, skipping any with a barcode that is 
+    already taken, either in the database or earlier in the import. Barcodes 
+    for the rest are reserved in a single query, and re-reserved if one is 
+    given elsewhere in the import. Returns the number of items created.
+    """
+
+    barcodes = [item.barcode for line_number, item in batch if item.barcode]
+    taken_barcodes = set(
+        Item.objects.filter(barcode__in=barcodes).values_list('barcode', flat=True)
+    )
+
+    items = []
+    for line_number, item in batch:
+        if item.barcode:
+            if item.barcode in taken_barcodes or item.barcode in used_barcodes:
+                errors.append((line_number, ['barcode: Item with this Barcode already exists.']))
+                continue
+            used_barcodes.add(item.barcode)
+        items.append((line_number, item))
+
+    if dry_run:
+        return len(items)
+
+    unbarcoded_items = [item for line_number, item in items if not item.barcode]
+    while unbarcoded_items:
+        # Reserved codes skip those in the database, but not those given 
+        # in the file that are yet to be inserted
+        for barcode in Item.reserve_barcodes(len(unbarcoded_items)):
+            if barcode in used_barcodes:
+                continue
+            item = unbarcoded_items.pop()
+            item.barcode = barcode
+            used_barcodes.add(barcode)
+
+    try:
+        with transaction.atomic():
+            Item.objects.bulk_create([item for line_number, item in items])
+    except IntegrityError:
+        return _create_rows(items, errors)
+
+    return len(items)
+
+
+def _create_rows(items, errors):
+    """
+    Creates a batch of items one at a time, after the batch insert failed, so 
+    the rows that clash with another item can be reported. Returns the number 
+    of items created.
+    """
+
+    created = 0
+    for line_number, item in items:
+        try:
+            with transaction.atomic():
+                Item.objects.bulk_create([item])
+        except IntegrityError as error:
+            errors.append((line_number, [f'Item could not be saved: {str(error).splitlines()[0]}']))
+        else:
+            created += 1
+
+    return created
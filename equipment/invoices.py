@@ -0,0 +1,215 @@
+import glob, hashlib, json, os, tempfile, zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Func, Sum
+from django.template.loader import render_to_string
+from django.utils import dateformat, timezone
+
+from .models import EquipmentBooking, EquipmentBookingItem
+from .pdf import render_invoice_pdf
+from .pricing import calculate_vat
+
+
+class ChargeableDays(Func):
+    """
+    A booking's duration rounded up to whole days, as in
+    EquipmentBooking.calc_chargeable_days().
+    """
+
+    template = 'CEIL(EXTRACT(EPOCH FROM %(expressions)s) / 86400)'
+    output_field = FloatField()
+
+
+MAX_INVOICE_BATCH = 500
+
+
+def allocate_invoice_numbers(bookings):
+    """
+    Gives each of the bookings without an invoice number the next one, and 
+    returns how many were numbered. The unnumbered bookings are locked while 
+    they are numbered, so bookings invoiced at the same time by another 
+    process are numbered once, by whichever gets to them first.
+    """
+
+    with transaction.atomic():
+        unnumbered = list(EquipmentBooking.objects.select_for_update(
+            ).filter(id__in=bookings.values('id'), invoice_number__isnull=True
+            ).order_by('start_at', 'id'))
+
+        if unnumbered:
+            invoice_numbers = EquipmentBooking.reserve_invoice_numbers(len(unnumbered))
+            for booking, invoice_number in zip(unnumbered, invoice_numbers):
+                booking.invoice_number = invoice_number
+            EquipmentBooking.objects.bulk_update(unnumbered, ['invoice_number'])
+
+    return len(unnumbered)
+
+
+def get_invoices(bookings):
+    """
+    Returns the invoice context for each of the given bookings, as rendered
+    by booking-invoice.html. Bookings are not numbered here, see 
+    allocate_invoice_numbers(). Invoices are built with a fixed number of 
+    queries however many bookings there are: one for the bookings, one for 
+    the totals grouped by booking, and one for the items.
+    """
+
+    bookings = list(bookings.select_related('created_by').order_by('start_at', 'id'))
+
+    booking_items = EquipmentBookingItem.objects.filter(equipment_booking__in=bookings
+        ).annotate(total=F('value') * ChargeableDays(F('equipment_booking__duration')))
+
+    totals = {
+        row['equipment_booking']: row['sub_total']
+        for row in booking_items.values('equipment_booking'
+            ).annotate(sub_total=Sum('total')
+            ).order_by()
+    }
+
+    items_by_booking = defaultdict(list)
+    for booking_item in booking_items.select_related('item', 'item__category').order_by('created_at'):
+        items_by_booking[booking_item.equipment_booking_id].append(booking_item)
+
+    invoices = []
+    for booking in bookings:
+        sub_total = totals.get(booking.id, 0.0)
+        vat_total, total = calculate_vat(sub_total, booking.vat_value)
+
+        invoices.append({
+            'booking': booking,
+            'chargeable_days': booking.calc_chargeable_days(),
+            'booking_items': items_by_booking[booking.id],
+            'sub_total': sub_total,
+            'vat_percentage': float(booking.vat_value),
+            'vat_total': vat_total,
+            'total_cost_vat': total,
+        })
+
+    return invoices
+
+
+def write_invoices_document(invoices, file):
+    """
+    Writes the invoices to a file as a single printable HTML document, one
+    invoice per page.
+    """
+
+    file.write(render_to_string('equipment/booking-invoices.html', {'invoices': invoices}).encode())
+
+
+def write_invoices_zip(invoices, file, pdf=False, workers=None):
+    """
+    Writes the invoices to a file as a zip of documents, one per booking,
+    named by invoice number. Invoices are HTML, or PDF if pdf is set, in
+    which case they are rendered across the given number of processes.
+    """
+
+    if pdf:
+        pdf_paths = write_invoice_pdfs(invoices, workers=workers)
+
+    with zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED) as invoices_zip:
+        for index, invoice in enumerate(invoices):
+            name = invoice['booking'].invoice_number
+
+            if pdf:
+                invoices_zip.write(pdf_paths[index], f'{name}.pdf')
+            else:
+                invoices_zip.writestr(
+                    f'{name}.html',
+                    render_to_string('equipment/booking-invoice.html', {**invoice, 'batch': True}),
+                )
+
+
+def invoice_pdf_path(booking, pdf_data):
+    """
+    Returns the cache path for a booking's invoice PDF. Paths are keyed by 
+    a digest of what is printed on the invoice, so bookings are rendered 
+    again when their number, items, or anything else shown on it changes.
+    """
+
+    # The date printed is the day the invoice was rendered, not a change
+    printed = {key: value for key, value in pdf_data.items() if key != 'date'}
+    digest = hashlib.sha256(json.dumps(printed, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(settings.INVOICE_PDF_CACHE_DIR, f'{booking.id}-{digest}.pdf')
+
+
+def invoice_pdf_data(invoice):
+    """
+    Returns the values printed on an invoice, formatted, for 
+    render_invoice_pdf().
+    """
+
+    booking = invoice['booking']
+    start_at = timezone.localtime(booking.start_at)
+    end_at = timezone.localtime(booking.end_at)
+
+    return {
+        'job_reference': booking.job_reference,
+        'invoice_number': booking.invoice_number,
+        'date': dateformat.format(timezone.localdate(), 'jS F Y'),
+        'job': ' / '.join(filter(None, [booking.job_reference, booking.job_number])),
+        'hire_period': f"{start_at:%d %b %Y, %H:%M} > {end_at:%d %b %Y, %H:%M}",
+        'chargeable_days': str(invoice['chargeable_days']),
+        'rows': [
+            (
+                str(number),
+                str(booking_item.item.category or '') if booking_item.item else '',
+                ' '.join(filter(None, [booking_item.item.name, booking_item.item.mount]))[:45] 
+                    if booking_item.item else '',
+                f'£{booking_item.value:.2f}',
+                f'£{booking_item.total:.2f}',
+            )
+            for number, booking_item in enumerate(invoice['booking_items'], start=1)
+        ],
+        'sub_total': f"£{invoice['sub_total']:.2f}",
+        'vat_percentage': f"{invoice['vat_percentage']:g}",
+        'vat_total': f"£{invoice['vat_total']:.2f}",
+        'total': f"£{invoice['total_cost_vat']:.2f}",
+    }
+
+
+def write_invoice_pdfs(invoices, workers=None):
+    """
+    Renders the invoices not already in the PDF cache, returning the cached 
+    path of each invoice. Batches are rendered across the given number of 
+    processes, by default one per core.
+    """
+
+    os.makedirs(settings.INVOICE_PDF_CACHE_DIR, exist_ok=True)
+
+    pdf_data = [invoice_pdf_data(invoice) for invoice in invoices]
+    pdf_paths = [invoice_pdf_path(invoice['booking'], data) for invoice, data in zip(invoices, pdf_data)]
+    missing = [
+        (invoice, data, pdf_path) 
+        for invoice, data, pdf_path in zip(invoices, pdf_data, pdf_paths) if not os.path.exists(pdf_path)
+    ]
+    missing_data = [data for invoice, data, pdf_path in missing]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+            documents = list(pool.map(render_invoice_pdf, missing_data, chunksize=8))
+    else:
+        documents = [render_invoice_pdf(data) for data in missing_data]
+
+    for (invoice, data, pdf_path), document in zip(missing, documents):
+
+        # Renders for earlier versions of the booking are dropped, which a 
+        # concurrent render may already have done
+        for stale_path in glob.glob(os.path.join(settings.INVOICE_PDF_CACHE_DIR, f"{invoice['booking'].id}-*.pdf")):
+            if stale_path != pdf_path:
+                try:
+                    os.remove(stale_path)
+                except FileNotFoundError:
+                    pass
+
+        # Written to a temporary file first, so readers never see a partial file
+        file_descriptor, temp_path = tempfile.mkstemp(dir=settings.INVOICE_PDF_CACHE_DIR)
+        with os.fdopen(file_descriptor, 'wb') as temp_file:
+            temp_file.write(document)
+        os.replace(temp_path, pdf_path)
+
+    return pdf_paths
@@ -0,0 +1,54 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.imports import import_items
+
+
+class Command(BaseCommand):
+    help = 'Imports items in bulk from a CSV file, with a header row of item field names.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV file.')
+        parser.add_argument('--user', help='Email of the user to record as the creator of the items.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of items inserted per query.')
+        parser.add_argument('--errors', help='Path to write a CSV report of skipped rows to.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without creating any items.')
+
+
+    def handle(self, *args, **options):
+
+        created_by = None
+        if options['user']:
+            try:
+                created_by = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email '{options['user']}'.")
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                created, errors = import_items(
+                    csv.DictReader(csv_file),
+                    created_by=created_by,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(e)
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as report_file:
+                writer = csv.writer(report_file)
+                writer.writerow(['line', 'error'])
+                for line_number, row_errors in errors:
+                    for error in row_errors:
+                        writer.writerow([line_number, error])
+        else:
+            for line_number, row_errors in errors:
+                for error in row_errors:
+                    self.stderr.write(f'Line {line_number}: {error}')
+
+        action = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{action} {created} items, skipped {len(errors)} rows.'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.filters import EquipmentBookingFilter
+from equipment.invoices import allocate_invoice_numbers, get_invoices, write_invoices_document, write_invoices_zip
+from equipment.models import EquipmentBooking
+
+
+class Command(BaseCommand):
+    help = 'Writes invoices for the confirmed bookings starting in a date range, to an HTML document or a zip.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path to write the invoices to. Paths ending .zip get one file per booking.')
+        parser.add_argument('--start', help='First booking start date to invoice, as YYYY-MM-DD.')
+        parser.add_argument('--end', help='Last booking start date to invoice, as YYYY-MM-DD.')
+        parser.add_argument('--search', help='Only invoice bookings with a matching job reference.')
+        parser.add_argument('--pdf', action='store_true', help='Write the zip of invoices as PDFs.')
+        parser.add_argument('--workers', type=int, help='Number of processes rendering PDFs. Defaults to one per core.')
+
+
+    def handle(self, *args, **options):
+
+        booking_filter = EquipmentBookingFilter(
+            {
+                'date_range_start': options['start'],
+                'date_range_end': options['end'],
+                'search': options['search'],
+            },
+            queryset=EquipmentBooking.objects.filter(status='CONFIRMED'),
+        )
+
+        if options['pdf'] and not options['output'].endswith('.zip'):
+            raise CommandError('PDF invoices can only be written to a zip.')
+
+        if not booking_filter.is_valid():
+            raise CommandError(booking_filter.errors.as_text())
+
+        allocate_invoice_numbers(booking_filter.qs)
+        invoices = get_invoices(booking_filter.qs)
+
+        try:
+            with open(options['output'], 'wb') as invoices_file:
+                if options['output'].endswith('.zip'):
+                    write_invoices_zip(invoices, invoices_file, pdf=options['pdf'], workers=options['workers'])
+                else:
+                    write_invoices_document(invoices, invoices_file)
+        except OSError as e:
+            raise CommandError(e)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(invoices)} invoices to {options['output']}."))
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from equipment.valuations import snapshot_valuations
+
+
+class Command(BaseCommand):
+    help = 'Snapshots the book value of each item and category as of a date, for valuation reports.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Date to value the fleet as of, as YYYY-MM-DD. Defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of snapshots written per query.')
+        parser.add_argument('--full', action='store_true', help='Recompute every item, not just those changed since the last run.')
+
+
+    def handle(self, *args, **options):
+
+        as_of = timezone.localdate()
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date '{options['date']}', expected YYYY-MM-DD.")
+
+        written = snapshot_valuations(
+            as_of,
+            batch_size=options['batch_size'],
+            full=options['full'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Snapshotted {written} items as of {as_of}.'))
@@ -0,0 +1,43 @@
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from equipment.utils import (
+    booking_calendar_cache_key,
+    clear_equipment_filterables,
+    get_booking_calendar,
+    get_cached_equipment_filterables,
+)
+
+
+class Command(BaseCommand):
+    help = 'Prefills the shared cache at deploy time, so the first requests after a deploy are not all misses.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3, help='Number of booking calendar months to warm, from this month.')
+
+
+    def handle(self, *args, **options):
+
+        if options['months'] < 0:
+            raise CommandError('--months cannot be negative.')
+
+        # Filterables, as shown on the dashboard and query sidebars
+        clear_equipment_filterables()
+        filterables = get_cached_equipment_filterables()
+
+        # Booking calendar months, rebuilt in case the cached layout changed
+        month = timezone.localdate().replace(day=1)
+        months = [month + relativedelta(months=offset) for offset in range(options['months'])]
+
+        cache.delete_many([booking_calendar_cache_key(month.year, month.month) for month in months])
+        for month in months:
+            get_booking_calendar(month.year, month.month)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {len(filterables['categories'])} categories, "
+            f"{len(filterables['manufacturers'])} manufacturers and "
+            f"{len(months)} calendar months."
+        ))
@@ -0,0 +1,188 @@
+import uuid
+
+from django.apps import apps
+from django.db import models
+from django.db.models import BooleanField, Case, Count, Exists, F, FloatField, Func, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Power
+from django.utils import timezone
+
+
+class ItemQuerySet(models.QuerySet):
+
+    def with_depreciated_value(self, as_of=None):
+        """
+        Annotates each item with its depreciated value as of the given date 
+        (default today), by its own depreciation method. The whole fleet is 
+        valued in a single query.
+        """
+
+        as_of = as_of or timezone.localdate()
+        EquipmentBookingItem = apps.get_model('equipment', 'EquipmentBookingItem')
+
+        rate = self.model.DEPRECIATION_RATE / 100
+        life = float(self.model.DEPRECIATION_USEFUL_LIFE)
+        lifetime_hire_days = float(self.model.DEPRECIATION_LIFETIME_HIRE_DAYS)
+
+        years_owned = Greatest(
+            Func(
+                Value(as_of), F('purchase_date'), 
+                arg_joiner=' - ', 
+                template='(%(expressions)s)::float / 365.25', 
+                output_field=FloatField(),
+            ),
+            Value(0.0),
+        )
+        remaining_life = Greatest(Value(life) - years_owned, Value(0.0))
+
+        # Days on completed, confirmed hires, for units of production
+        days_hired = Subquery(
+            EquipmentBookingItem.objects.filter(
+                item=OuterRef('pk'),
+                equipment_booking__status='CONFIRMED',
+                equipment_booking__end_at__date__lte=as_of,
+            ).values('item').annotate(
+                days=Sum(Func(
+                    F('equipment_booking__duration'), 
+                    template='EXTRACT(EPOCH FROM %(expressions)s)', 
+                    output_field=FloatField(),
+                )) / 86400
+            ).values('days'),
+            output_field=FloatField(),
+        )
+
+        cost = F('purchase_cost')
+
+        return self.annotate(depreciated_value=Case(
+            When(
+                depreciation_method='UNITS-OF-PRODUCTION', 
+                then=cost * Greatest(Value(1.0) - Coalesce(days_hired, Value(0.0)) / lifetime_hire_days, Value(0.0)),
+            ),
+            When(purchase_date__isnull=True, then=cost),
+            When(
+                depreciation_method='STRAIGHT-LINE', 
+                then=cost * remaining_life / life,
+            ),
+            When(
+                depreciation_method='SUM-OF-YEARS', 
+                then=cost * remaining_life * (remaining_life + 1) / (life * (life + 1)),
+            ),
+            # Declining balance, which items without a method also default to
+            default=cost * Power(Value(1 - rate), years_owned),
+            output_field=FloatField(),
+        ))
+
+
+    def available(self, period):
+        """
+        Returns items free to book for the given period: not deleted, not 
+        assigned, and not held by a pending or confirmed booking overlapping 
+        the period.
+        """
+
+        EquipmentBookingItem = apps.get_model('equipment', 'EquipmentBookingItem')
+
+        return self.filter(deleted=False, assigned_to__isnull=True).exclude(
+            Exists(EquipmentBookingItem.objects.active().overlapping(period).filter(item=OuterRef('pk')))
+        )
+
+
+    def by_reference(self, references):
+        """
+        Returns the items whose id or barcode is one of the given references.
+        """
+
+        ids = []
+        for reference in references:
+            try:
+                ids.append(uuid.UUID(reference))
+            except ValueError:
+                pass
+
+        return self.filter(Q(pk__in=ids) | Q(barcode__in=references))
+
+
+    def with_booking_state(self, booking):
+        """
+        Annotates each item with whether it is already in the given booking 
+        (`in_booking`), and whether another pending or confirmed booking 
+        overlapping it holds the item (`booked`).
+        """
+
+        EquipmentBookingItem = apps.get_model('equipment', 'EquipmentBookingItem')
+
+        return self.annotate(
+            in_booking=Exists(
+                EquipmentBookingItem.objects.filter(equipment_booking=booking, item=OuterRef('pk'))
+            ),
+            booked=Exists(
+                EquipmentBookingItem.objects.active(
+                    ).overlapping(booking.period
+                    ).filter(item=OuterRef('pk')
+                    ).exclude(equipment_booking=booking)
+            ),
+        )
+
+
+    def valuation(self, as_of=None):
+        """
+        Returns the total purchase cost and depreciated value of the items, 
+        aggregated in a single query.
+        """
+
+        return self.with_depreciated_value(as_of).aggregate(
+            total_cost=Sum('purchase_cost', default=0.0),
+            total_value=Sum('depreciated_value', default=0.0),
+        )
+
+
+class EquipmentBookingItemQuerySet(models.QuerySet):
+
+    def active(self):
+        """
+        Returns booking items belonging to pending or confirmed bookings.
+        """
+
+        return self.filter(active=True)
+
+
+    def overlapping(self, period):
+        """
+        Returns booking items whose booking period overlaps the given period.
+        """
+
+        return self.filter(period__overlap=period)
+
+
+class KitQuerySet(models.QuerySet):
+
+    def with_availability(self, period=None):
+        """
+        Annotates each kit with its number of items (`item_count`) and, for 
+        the given period, how many of them are free to book 
+        (`available_count`) and whether the whole kit is (`available`). Kits 
+        are counted in a single aggregate query.
+        """
+
+        Item = apps.get_model('equipment', 'Item')
+
+        kits = self.annotate(item_count=Count('items', filter=Q(items__deleted=False)))
+
+        if period is None:
+            return kits
+
+        available_count = Item.objects.available(period
+            ).filter(kits=OuterRef('pk')
+            ).order_by(
+            ).values('kits'
+            ).annotate(count=Count('pk')
+            ).values('count')
+
+        return kits.annotate(
+            available_count=Coalesce(Subquery(available_count), 0),
+        ).annotate(
+            available=Case(
+                When(item_count__gt=0, item_count=F('available_count'), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
@@ -0,0 +1,119 @@
+# Generated by Django 5.1 on 2026-10-18 18:40
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.conf import settings
+from django.db import migrations, models
+
+
+def release_overlapping_booking_items(apps, schema_editor):
+    """
+    Bookings were only checked for clashes when items were added or the 
+    booking confirmed, so existing rows can overlap. Pending bookings give 
+    way: their clashing items are made inactive, so they are reported when 
+    the booking is next verified. Clashing confirmed bookings cannot be 
+    resolved here, and are listed for fixing by hand before migrating again.
+    """
+
+    EquipmentBookingItem = apps.get_model('equipment', 'EquipmentBookingItem')
+
+    # Confirmed bookings first, then pending ones by age, so the earliest 
+    # pending booking keeps the item
+    booking_items = EquipmentBookingItem.objects.using(schema_editor.connection.alias).filter(
+        active=True, 
+        item__isnull=False, 
+        period__isnull=False,
+    ).select_related('equipment_booking').order_by(
+        'item', 
+        models.Case(models.When(equipment_booking__status='CONFIRMED', then=0), default=1),
+        'equipment_booking__created_at',
+    )
+
+    held = {}
+    released = []
+    conflicts = []
+
+    for booking_item in booking_items:
+        periods = held.setdefault(booking_item.item_id, [])
+        clash = next((
+            (other, period) for other, period in periods
+            if booking_item.period.lower < period.upper and period.lower < booking_item.period.upper
+        ), None)
+
+        if clash is None:
+            periods.append((booking_item.equipment_booking, booking_item.period))
+        elif booking_item.equipment_booking.status == 'PENDING':
+            released.append(booking_item.id)
+        else:
+            conflicts.append(
+                f'item {booking_item.item_id}: confirmed bookings {clash[0].id} '
+                f'({clash[0].job_reference}) and {booking_item.equipment_booking.id} '
+                f'({booking_item.equipment_booking.job_reference})'
+            )
+
+    if conflicts:
+        raise RuntimeError(
+            'Cannot add exclude_overlapping_item_bookings, as confirmed bookings '
+            'overlap on these items:\n' + '\n'.join(conflicts)
+        )
+
+    EquipmentBookingItem.objects.using(schema_editor.connection.alias).filter(id__in=released).update(active=False)
+
+    # Rows updated twice in this transaction queue deferred foreign key 
+    # checks, which must run before the table can be altered
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmentbookingitem',
+            name='active',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipmentbookingitem',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentbooking',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['period'], name='equipment_booking_period_idx'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                """
+                UPDATE equipment_equipmentbooking
+                SET period = tstzrange(start_at, end_at, '[)');
+                """,
+                """
+                UPDATE equipment_equipmentbookingitem AS booking_item
+                SET period = booking.period,
+                    active = booking.status IN ('PENDING', 'CONFIRMED')
+                FROM equipment_equipmentbooking AS booking
+                WHERE booking_item.equipment_booking_id = booking.id;
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(release_overlapping_booking_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='equipmentbookingitem',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('active', True)), expressions=[('item', '='), ('period', '&&')], name='exclude_overlapping_item_bookings', violation_error_message='This item is already booked for that period.'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_booking_period_exclusion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmentbooking',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'CONFIRMED'])), fields=['status', 'start_at', 'end_at'], name='equipment_booking_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentbooking',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['created_by'], name='equipment_booking_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentbookingitem',
+            index=models.Index(fields=['item', 'equipment_booking'], name='equipment_booking_item_idx'),
+        ),
+        migrations.AlterField(
+            model_name='equipmentbookingitem',
+            name='item',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='booked_items', to='equipment.item'),
+        ),
+    ]
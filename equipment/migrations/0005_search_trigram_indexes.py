@@ -0,0 +1,39 @@
+# Generated by Django 5.1 on 2026-10-18 18:45
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_item_listing_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='equipment_category_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentbooking',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('job_reference'), name='gin_trgm_ops'), name='equipment_booking_ref_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='equipment_item_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('model_number', name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass('serial_number', name='gin_trgm_ops'), name='equipment_item_number_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manufacturer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='equipment_manuf_trgm_idx'),
+        ),
+    ]
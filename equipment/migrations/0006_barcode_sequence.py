@@ -0,0 +1,53 @@
+# Generated by Django 5.1 on 2026-10-18 18:48
+
+import equipment.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_search_trigram_indexes'),
+    ]
+
+    operations = [
+        # Internal barcodes are EAN-13 codes in the 2x (restricted circulation) 
+        # range, numbered from a sequence. Codes already in use, i.e. entered 
+        # by hand, are skipped.
+        migrations.RunSQL(
+            sql=[
+                "CREATE SEQUENCE equipment_item_barcode_seq;",
+                """
+                CREATE FUNCTION equipment_next_barcode() RETURNS varchar AS $$
+                DECLARE
+                    payload text;
+                    total integer;
+                BEGIN
+                    LOOP
+                        payload := '2' || lpad(nextval('equipment_item_barcode_seq')::text, 11, '0');
+                        total := 0;
+                        FOR position IN 1..12 LOOP
+                            total := total + substr(payload, position, 1)::integer 
+                                * CASE WHEN position % 2 = 0 THEN 3 ELSE 1 END;
+                        END LOOP;
+                        payload := payload || ((10 - total % 10) % 10)::text;
+                        EXIT WHEN NOT EXISTS (
+                            SELECT 1 FROM equipment_item WHERE barcode = payload
+                        );
+                    END LOOP;
+                    RETURN payload;
+                END;
+                $$ LANGUAGE plpgsql VOLATILE;
+                """,
+            ],
+            reverse_sql=[
+                "DROP FUNCTION equipment_next_barcode();",
+                "DROP SEQUENCE equipment_item_barcode_seq;",
+            ],
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='barcode',
+            field=models.CharField(blank=True, db_default=equipment.models.NextBarcode(), max_length=13, null=True, unique=True),
+        ),
+    ]
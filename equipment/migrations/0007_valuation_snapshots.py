@@ -0,0 +1,50 @@
+# Generated by Django 5.1 on 2026-10-18 18:56
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_barcode_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryValuationSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('purchase_cost', models.FloatField(default=0.0)),
+                ('depreciated_value', models.FloatField(default=0.0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='valuation_snapshots', to='equipment.category')),
+            ],
+            options={
+                'verbose_name': 'Category Valuation Snapshot',
+                'verbose_name_plural': 'Category Valuation Snapshots',
+                'ordering': ['date', 'category__name'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='unique_category_valuation_snapshot', nulls_distinct=False)],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemValuationSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('purchase_cost', models.FloatField(default=0.0)),
+                ('depreciated_value', models.FloatField(default=0.0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='equipment.category')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuation_snapshots', to='equipment.item')),
+            ],
+            options={
+                'verbose_name': 'Item Valuation Snapshot',
+                'verbose_name_plural': 'Item Valuation Snapshots',
+                'constraints': [models.UniqueConstraint(fields=('date', 'item'), name='unique_item_valuation_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_valuation_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='chargeable_days',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='insured_value',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='sub_total',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='total',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='vat_total',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
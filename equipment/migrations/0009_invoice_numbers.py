@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_booking_costs'),
+    ]
+
+    operations = [
+        # Invoice numbers are allocated in blocks from a sequence, see 
+        # EquipmentBooking.reserve_invoice_numbers()
+        migrations.RunSQL(
+            sql="CREATE SEQUENCE equipment_booking_invoice_seq;",
+            reverse_sql="DROP SEQUENCE equipment_booking_invoice_seq;",
+        ),
+        migrations.AddField(
+            model_name='equipmentbooking',
+            name='invoice_number',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True, unique=True),
+        ),
+    ]
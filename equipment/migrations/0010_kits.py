@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 19:16
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_invoice_numbers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Kit',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kit_created_by', to=settings.AUTH_USER_MODEL)),
+                ('items', models.ManyToManyField(blank=True, related_name='kits', to='equipment.item')),
+            ],
+            options={
+                'verbose_name': 'Kit',
+                'verbose_name_plural': 'Kits',
+                'ordering': ['name'],
+            },
+        ),
+    ]
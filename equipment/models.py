@@ -1,11 +1,21 @@
-import uuid, string, random
+import math, uuid
 from datetime import timedelta
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from core.utils import convert_duration_to_hours
+from .managers import ItemQuerySet, EquipmentBookingItemQuerySet, KitQuerySet
+from . import pricing
+
 
 class Manufacturer(models.Model):
     id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True, editable=False)
@@ -17,6 +27,12 @@ class Manufacturer(models.Model):
         verbose_name = 'Manufacturer'
         verbose_name_plural = 'Manufacturers'
         ordering = ['name',]
+        indexes = [
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='equipment_manuf_trgm_idx',
+            ),
+        ]
 
 
     def __str__(self):
@@ -33,12 +49,28 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name',]
+        indexes = [
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='equipment_category_trgm_idx',
+            ),
+        ]
 
 
     def __str__(self):
         return str(self.name)
 
 
+class NextBarcode(models.Func):
+    """
+    Allocates the next internal EAN-13 barcode from the database sequence. 
+    See migration 0006 for the equipment_next_barcode() function.
+    """
+
+    function = 'equipment_next_barcode'
+    output_field = models.CharField(max_length=13)
+
+
 class Item(models.Model):
 
     STATUS_CHOICES = (
@@ -57,6 +89,11 @@ class Item(models.Model):
         ('UNITS-OF-PRODUCTION', 'Units of Production'),
     )
 
+    # Depreciation assumptions
+    DEPRECIATION_RATE = 20 # Annual percentage, for declining balance
+    DEPRECIATION_USEFUL_LIFE = 5 # Years, for straight line and sum of years
+    DEPRECIATION_LIFETIME_HIRE_DAYS = 1000 # For units of production
+
     SERVICE_INTERVAL_CHOICES = [
         (timedelta(days=30), '1 Month'),
         (timedelta(days=90), '3 Months'),
@@ -98,7 +135,7 @@ class Item(models.Model):
     model_number = models.CharField(max_length=100, null=True, blank=True)
     serial_number = models.CharField(max_length=50, null=True, blank=True)
     status = models.CharField(choices=STATUS_CHOICES, default='POOL')
-    barcode = models.CharField(max_length=13, null=True, blank=True, db_index=True)
+    barcode = models.CharField(max_length=13, null=True, blank=True, unique=True, db_default=NextBarcode())
     notes = models.TextField(max_length=1000, null=True, blank=True)
 
     assigned_to = models.ForeignKey(
@@ -122,6 +159,8 @@ class Item(models.Model):
     deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    objects = ItemQuerySet.as_manager()
+
 
     class Meta:
         verbose_name = 'Item'
@@ -129,46 +168,98 @@ class Item(models.Model):
         permissions = [            
             ('assign_item', 'Can assign an item to individual.'),
         ]        
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=Q(deleted=False),
+                name='equipment_item_listing_idx',
+            ),
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='equipment_item_name_trgm_idx',
+            ),
+            GinIndex(
+                OpClass('model_number', name='gin_trgm_ops'),
+                OpClass('serial_number', name='gin_trgm_ops'),
+                name='equipment_item_number_trgm_idx',
+            ),
+        ]
 
 
     def __str__(self):
         return str(self.id)
     
 
+    @classmethod
+    def reserve_barcodes(cls, count):
+        """
+        Allocates a block of unique barcode numbers in a single query, i.e. 
+        for bulk imports.
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT equipment_next_barcode() FROM generate_series(1, %s)', 
+                [count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
     def generate_barcode(self):
         """
-        Generates a unique barcode number for internal use.
+        Allocates a unique barcode number for internal use.
         """
         
-        numbers = string.digits
-        max_attempts = 100
+        return self.reserve_barcodes(1)[0]
     
-        for attempt in range(max_attempts):
-            barcode = ''.join(
-                [numbers[random.randint(0, len(numbers)-1)] for i in range(13)]
-            )
 
-            if not Item.objects.filter(barcode=barcode).exists():
-                return barcode
-            
-        raise ValueError(
-            "Failed to generate a unique barcode after several attempts."
-        )
-    
+    def calculate_depreciation(self, as_of=None):
+        """
+        Returns the item's depreciated value as of the given date (default 
+        today), by its depreciation method, from its values in memory. The 
+        formulas match Item.objects.with_depreciated_value(), which should be 
+        used to value many items at once.
+        """
+
+        as_of = as_of or timezone.localdate()
+        cost = self.purchase_cost
+        life = float(self.DEPRECIATION_USEFUL_LIFE)
+
+        if self.depreciation_method == 'UNITS-OF-PRODUCTION':
+            return cost * max(1 - self.calculate_days_hired(as_of) / self.DEPRECIATION_LIFETIME_HIRE_DAYS, 0.0)
+
+        if not self.purchase_date:
+            return cost
 
-    def calculate_depreciation(self):
+        years_owned = max((as_of - self.purchase_date).days / 365.25, 0.0)
+        remaining_life = max(life - years_owned, 0.0)
 
-        # Annual depreciation rate as percentage
-        depreciation_rate = 20
-        purchase_date = self.purchase_date
+        if self.depreciation_method == 'STRAIGHT-LINE':
+            return cost * remaining_life / life
 
-        if purchase_date:
-            years_owned = (timezone.now().date() - purchase_date).days / 365.25
-            depreciated_value = self.purchase_cost * ((1 - depreciation_rate / 100) ** years_owned)
-        else:
-            depreciated_value = self.purchase_cost
+        if self.depreciation_method == 'SUM-OF-YEARS':
+            return cost * remaining_life * (remaining_life + 1) / (life * (life + 1))
 
-        return depreciated_value
+        # Declining balance, which items without a method also default to
+        return cost * (1 - self.DEPRECIATION_RATE / 100) ** years_owned
+
+
+    def calculate_days_hired(self, as_of=None):
+        """
+        Returns the days the item has spent on completed, confirmed hires, 
+        as of the given date (default today).
+        """
+
+        if self._state.adding:
+            return 0.0
+
+        as_of = as_of or timezone.localdate()
+        duration = self.booked_items.filter(
+            equipment_booking__status='CONFIRMED',
+            equipment_booking__end_at__date__lte=as_of,
+        ).aggregate(duration=models.Sum('equipment_booking__duration'))['duration']
+
+        return duration.total_seconds() / 86400 if duration else 0.0
     
 
     def assign_item(self, user_id):
@@ -205,8 +296,12 @@ class Item(models.Model):
 
     def save(self, *args, **kwargs):
 
+        # New items are given a barcode by the database as part of the insert
         if not self.barcode:
-            self.barcode = self.generate_barcode()
+            if self._state.adding:
+                self.barcode = self._meta.get_field('barcode').get_default()
+            else:
+                self.barcode = self.generate_barcode()
 
         super(Item, self).save(*args, **kwargs)
 
@@ -219,6 +314,9 @@ class EquipmentBooking(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
 
+    # Statuses in which a booking holds its items
+    ACTIVE_STATUSES = ['PENDING', 'CONFIRMED']
+
     id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -243,6 +341,7 @@ class EquipmentBooking(models.Model):
     start_at = models.DateTimeField()
     end_at = models.DateTimeField()
     duration = models.DurationField(null=True, blank=True)
+    period = DateTimeRangeField(null=True, blank=True, editable=False)
     notes = models.TextField(max_length=300, null=True, blank=True)
 
     vat_value = models.DecimalField(default=20.00, max_digits=4, decimal_places=2)
@@ -252,41 +351,171 @@ class EquipmentBooking(models.Model):
     cancelled = models.BooleanField(default=False)
     cancelled_at = models.DateTimeField(null=True, blank=True)
     cancellation_reason = models.TextField(null=True, blank=True)
+    invoice_number = models.CharField(max_length=12, null=True, blank=True, unique=True, editable=False)
+
+    # Costs, stored when the booking is confirmed and cleared when its items 
+    # or chargeable days change. See equipment/pricing.py
+    chargeable_days = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    sub_total = models.FloatField(null=True, blank=True, editable=False)
+    vat_total = models.FloatField(null=True, blank=True, editable=False)
+    total = models.FloatField(null=True, blank=True, editable=False)
+    insured_value = models.FloatField(null=True, blank=True, editable=False)
 
 
     class Meta:
         verbose_name = 'Equipment Booking'
         verbose_name_plural = 'Equipment Bookings'
+        indexes = [
+            GistIndex(fields=['period'], name='equipment_booking_period_idx'),
+            models.Index(
+                fields=['status', 'start_at', 'end_at'],
+                condition=Q(status__in=['PENDING', 'CONFIRMED']),
+                name='equipment_booking_active_idx',
+            ),
+            models.Index(
+                fields=['created_by'],
+                condition=Q(status='PENDING'),
+                name='equipment_booking_pending_idx',
+            ),
+            GinIndex(
+                OpClass(Upper('job_reference'), name='gin_trgm_ops'),
+                name='equipment_booking_ref_trgm_idx',
+            ),
+        ]
 
        
     def __str__(self):
         return str(self.job_reference)
+
+
+    # The period as loaded from the database, so that moves can be detected
+    _loaded_period = None
+
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_period = instance.__dict__.get('period')
+        return instance
     
 
     def calc_duration(self):
         return self.end_at - self.start_at
     
 
+    def calc_period(self):
+        return DateTimeTZRange(self.start_at, self.end_at, '[)')
+    
+
+    @classmethod
+    def reserve_invoice_numbers(cls, count):
+        """
+        Returns the given number of invoice numbers, allocated from the 
+        database sequence in a single query.
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval('equipment_booking_invoice_seq') FROM generate_series(1, %s)", 
+                [count],
+            )
+            return [f'INV-{number:06d}' for (number,) in cursor.fetchall()]
+
+
+    def calc_chargeable_days(self):
+        duration = self.calc_duration()
+        return math.ceil(convert_duration_to_hours(duration.days, duration.seconds) / 24)
+
+
+    @property
+    def is_priced(self):
+        return self.sub_total is not None
+
+
+    def clear_costs(self):
+        for field in pricing.COST_FIELDS:
+            setattr(self, field, None)
+
+
+    def touch(self):
+        """
+        Marks the booking as updated, as its items have changed, clearing its 
+        stored costs. Rendered invoices are keyed by the booking's last update.
+        """
+
+        self.clear_costs()
+        self.updated_at = timezone.now()
+        self.save(update_fields=['updated_at', *pricing.COST_FIELDS])
+
+
+    def add_items(self, items):
+        """
+        Adds the given items to the booking with a single insert, returning 
+        the new booking items. Raises IntegrityError if any are already in the 
+        booking, or booked for an overlapping period.
+        """
+
+        with transaction.atomic():
+            booking_items = EquipmentBookingItem.objects.bulk_create([
+                EquipmentBookingItem(
+                    equipment_booking=self,
+                    item=item,
+                    value=item.hire_day_rate,
+                    period=self.period,
+                    active=self.status in self.ACTIVE_STATUSES,
+                )
+                for item in items
+            ])
+
+            if booking_items:
+                self.touch()
+
+        return booking_items
+
+
+    def remove_items(self, items):
+        """
+        Removes the given items from the booking with a single delete, 
+        returning the number removed.
+        """
+
+        with transaction.atomic():
+            removed, _ = self.booking_items.filter(item__in=items).delete()
+
+            if removed:
+                self.touch()
+
+        return removed
+    
+
+    def get_conflicting_items(self):
+        """
+        Returns booking items from other pending / confirmed bookings that 
+        clash with any item in this booking, in a single query.
+        """
+
+        return EquipmentBookingItem.objects.select_related(
+            'item',
+            'equipment_booking',
+        ).active().overlapping(self.calc_period()).filter(
+            item__in=self.booking_items.values('item'),
+        ).exclude(equipment_booking=self).order_by('item__name')
+    
+
     def verify_booking(self):
-        booked_items = self.booking_items.all()
-        booking_start = self.start_at
-        booking_end = self.end_at
 
         # Check if booking contains at least one item
-        if booked_items.count() < 1:
+        if not self.booking_items.exists():
             raise ValidationError('Bookings must contain at least one item.')
 
         # Check if any of the items in the current booking are already booked during the same date and time
-        for item in booked_items:
-            conflicting_bookings = EquipmentBookingItem.objects.filter(
-                item=item.item,
-                equipment_booking__start_at__lt=booking_end,
-                equipment_booking__end_at__gt=booking_start,
-                equipment_booking__status__in=['PENDING', 'CONFIRMED'],
-            ).exclude(equipment_booking=self)
+        conflicting_items = self.get_conflicting_items()
 
-            if conflicting_bookings.exists():
-                raise ValidationError(f"One or more items is already booked for that period.")
+        if conflicting_items:
+            raise ValidationError([
+                f'{conflict.item.name} ({conflict.item.barcode}) is already booked on {conflict.equipment_booking}.'
+                for conflict in conflicting_items
+            ])
 
         # If no conflicts, booking is valid
         return True
@@ -300,6 +529,10 @@ class EquipmentBooking(models.Model):
     def confirm(self):
         self.status = 'CONFIRMED'
         self.confirmed = True
+
+        for field, value in pricing.price_booking(self).items():
+            setattr(self, field, value)
+
         self.save()
 
 
@@ -322,10 +555,30 @@ class EquipmentBooking(models.Model):
 
     def save(self, *args, **kwargs):
 
+        adding = self._state.adding
+
         if self.start_at and self.end_at:
             self.duration = self.calc_duration()
+            self.period = self.calc_period()
 
-        super(EquipmentBooking, self).save(*args, **kwargs)        
+        # Stored costs only stand while the chargeable days are unchanged
+        if self.is_priced:
+            if self.chargeable_days != self.calc_chargeable_days():
+                self.clear_costs()
+            else:
+                self.vat_total, self.total = pricing.calculate_vat(self.sub_total, self.vat_value)
+
+        with transaction.atomic():
+            super(EquipmentBooking, self).save(*args, **kwargs)        
+
+            # Keep the denormalised period / active flag on booking items in 
+            # sync, so the exclusion constraint sees the booking's current state.
+            update_fields = kwargs.get('update_fields')
+            if not adding and (update_fields is None or {'start_at', 'end_at', 'status'} & set(update_fields)):
+                self.booking_items.update(
+                    period=self.period,
+                    active=self.status in self.ACTIVE_STATUSES,
+                )
 
 
 
@@ -343,14 +596,39 @@ class EquipmentBookingItem(models.Model):
         null=True, 
         blank=True,
         related_name='booked_items',
+        db_index=False,
     )
     value = models.FloatField(default=0.00)
 
+    # Denormalised from the booking, so that overlapping bookings of the same 
+    # item can be rejected by the database.
+    period = DateTimeRangeField(null=True, blank=True, editable=False)
+    active = models.BooleanField(default=True, editable=False)
+
+    objects = EquipmentBookingItemQuerySet.as_manager()
+
 
     class Meta:
         verbose_name = 'Equipment Booking Item'
         verbose_name_plural = 'Equipment Booking Items'
         unique_together = ('equipment_booking', 'item')
+        indexes = [
+            models.Index(
+                fields=['item', 'equipment_booking'],
+                name='equipment_booking_item_idx',
+            ),
+        ]
+        constraints = [
+            ExclusionConstraint(
+                name='exclude_overlapping_item_bookings',
+                expressions=[
+                    ('item', RangeOperators.EQUAL),
+                    ('period', RangeOperators.OVERLAPS),
+                ],
+                condition=Q(active=True),
+                violation_error_message='This item is already booked for that period.',
+            ),
+        ]
 
 
     def __str__(self):
@@ -362,4 +640,135 @@ class EquipmentBookingItem(models.Model):
         if self.item:
             self.value = self.item.hire_day_rate
 
-        super(EquipmentBookingItem, self).save(*args, **kwargs)   
\ No newline at end of file
+        self.period = self.equipment_booking.period
+        self.active = self.equipment_booking.status in EquipmentBooking.ACTIVE_STATUSES
+
+        super(EquipmentBookingItem, self).save(*args, **kwargs)
+        self.equipment_booking.touch()
+
+
+    def delete(self, *args, **kwargs):
+        deleted = super(EquipmentBookingItem, self).delete(*args, **kwargs)
+        self.equipment_booking.touch()
+        return deleted
+
+
+class Kit(models.Model):
+    """
+    A group of items that travel together and are booked as a unit, i.e. a 
+    camera package or lighting kit.
+    """
+
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='kit_created_by',
+    )
+    name = models.CharField(max_length=100)
+    notes = models.TextField(null=True, blank=True)
+    items = models.ManyToManyField(Item, related_name='kits', blank=True)
+
+    objects = KitQuerySet.as_manager()
+
+
+    class Meta:
+        verbose_name = 'Kit'
+        verbose_name_plural = 'Kits'
+        ordering = ['name',]
+
+
+    def __str__(self):
+        return str(self.name)
+
+
+    def add_to_booking(self, booking):
+        """
+        Adds the kit's items to the booking with a single insert. Raises 
+        IntegrityError if any of them are already booked for an overlapping 
+        period.
+        """
+
+        return booking.add_items(self.items.filter(deleted=False))
+
+
+class ItemValuationSnapshot(models.Model):
+    """
+    An item's book value as of a date. Written in bulk by the 
+    snapshot_valuations command, see equipment/valuations.py.
+    """
+
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True, editable=False)
+    computed_at = models.DateTimeField(auto_now=True)
+    date = models.DateField()
+    item = models.ForeignKey(
+        Item, 
+        on_delete=models.CASCADE,
+        related_name='valuation_snapshots',
+    )
+    category = models.ForeignKey(
+        Category, 
+        on_delete=models.SET_NULL, 
+        null=True, 
+        blank=True,
+        related_name='+',
+    )
+    purchase_cost = models.FloatField(default=0.00)
+    depreciated_value = models.FloatField(default=0.00)
+
+
+    class Meta:
+        verbose_name = 'Item Valuation Snapshot'
+        verbose_name_plural = 'Item Valuation Snapshots'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'item'],
+                name='unique_item_valuation_snapshot',
+            ),
+        ]
+
+
+    def __str__(self):
+        return f'{self.item_id} ({self.date})'
+
+
+class CategoryValuationSnapshot(models.Model):
+    """
+    The total book value of a category's items as of a date, rolled up from 
+    the item snapshots. Items without a category have a null category.
+    """
+
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True, editable=False)
+    computed_at = models.DateTimeField(auto_now=True)
+    date = models.DateField()
+    category = models.ForeignKey(
+        Category, 
+        on_delete=models.SET_NULL, 
+        null=True, 
+        blank=True,
+        related_name='valuation_snapshots',
+    )
+    item_count = models.PositiveIntegerField(default=0)
+    purchase_cost = models.FloatField(default=0.00)
+    depreciated_value = models.FloatField(default=0.00)
+
+
+    class Meta:
+        verbose_name = 'Category Valuation Snapshot'
+        verbose_name_plural = 'Category Valuation Snapshots'
+        ordering = ['date', 'category__name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'category'],
+                name='unique_category_valuation_snapshot',
+                nulls_distinct=False,
+            ),
+        ]
+
+
+    def __str__(self):
+        return f'{self.category_id} ({self.date})'
@@ -0,0 +1,77 @@
+from core.pdf import PDFDocument, PAGE_HEIGHT, PAGE_WIDTH
+
+
+# Page layout, in points
+MARGIN = 50
+LINE_HEIGHT = 16
+COLUMNS = [MARGIN, MARGIN + 30, MARGIN + 150, MARGIN + 380, MARGIN + 450]
+
+
+def render_invoice_pdf(invoice):
+    """
+    Returns an invoice as PDF bytes. Takes the plain values built by
+    equipment.invoices.invoice_pdf_data(), rather than model instances, so
+    invoices can be rendered in worker processes.
+    """
+
+    document = PDFDocument(title=f"Invoice - {invoice['job_reference']}")
+    document.add_page()
+    y = PAGE_HEIGHT - MARGIN - 20
+
+    document.text(MARGIN, y, 'Invoice', size=22, font='bold')
+    if invoice['invoice_number']:
+        y -= LINE_HEIGHT + 4
+        document.text(MARGIN, y, invoice['invoice_number'], font='bold')
+
+    # Address
+    y -= LINE_HEIGHT * 2.5
+    document.text(MARGIN, y, 'Business Name', font='bold')
+    for line in ['Address 1', 'Address 2', 'City, Postcode', '', invoice['date']]:
+        y -= LINE_HEIGHT
+        document.text(MARGIN, y, line)
+
+    # Hire Period
+    y -= LINE_HEIGHT * 2
+    for label, value in [
+        ('Job', invoice['job']),
+        ('Hire Period', invoice['hire_period']),
+        ('Chargeable Days', invoice['chargeable_days']),
+    ]:
+        document.text(MARGIN, y, label, font='bold')
+        document.text(MARGIN, y - LINE_HEIGHT, value)
+        y -= LINE_HEIGHT * 2.5
+
+    # Item List, continued over as many pages as it needs
+    def table_header(y):
+        for x, heading in zip(COLUMNS, ['#', 'Type', 'Item', 'Rate', 'Total']):
+            document.text(x, y, heading, font='bold')
+        document.line(MARGIN, y - 6, PAGE_WIDTH - MARGIN, y - 6, width=1)
+        return y - LINE_HEIGHT - 4
+
+    y = table_header(y)
+    for row in invoice['rows']:
+        if y < MARGIN + LINE_HEIGHT * 4:
+            document.add_page()
+            y = table_header(PAGE_HEIGHT - MARGIN)
+
+        for x, value in zip(COLUMNS, row):
+            document.text(x, y, value)
+        document.line(MARGIN, y - 5, PAGE_WIDTH - MARGIN, y - 5)
+        y -= LINE_HEIGHT + 2
+
+    # Totals
+    y -= LINE_HEIGHT
+    for label, value in [
+        ('Sub Total', invoice['sub_total']),
+        (f"VAT ({invoice['vat_percentage']}%)", invoice['vat_total']),
+        ('Total', invoice['total']),
+    ]:
+        if y < MARGIN:
+            document.add_page()
+            y = PAGE_HEIGHT - MARGIN
+
+        document.text(COLUMNS[3] - 40, y, label, font='bold')
+        document.text(COLUMNS[4], y, value)
+        y -= LINE_HEIGHT
+
+    return document.render()
@@ -0,0 +1,57 @@
+from django.db.models import F, FloatField, Sum
+
+
+# Stored on EquipmentBooking once the booking is confirmed
+COST_FIELDS = ['chargeable_days', 'sub_total', 'vat_total', 'total', 'insured_value']
+
+
+def calculate_vat(sub_total, vat_percentage):
+    """
+    Returns (VAT, total including VAT) for a sub total.
+    """
+
+    vat_total = (sub_total / 100) * float(vat_percentage)
+    return vat_total, sub_total + vat_total
+
+
+def price_booking(booking):
+    """
+    Returns the chargeable days, sub total, VAT, total and insured value of a
+    booking, totalled in a single query.
+    """
+
+    chargeable_days = booking.calc_chargeable_days()
+
+    totals = booking.booking_items.aggregate(
+        sub_total=Sum(F('value') * chargeable_days, default=0.0, output_field=FloatField()),
+        insured_value=Sum('item__purchase_cost', default=0.0),
+    )
+    vat_total, total = calculate_vat(totals['sub_total'], booking.vat_value)
+
+    return {
+        'chargeable_days': chargeable_days,
+        'sub_total': totals['sub_total'],
+        'vat_total': vat_total,
+        'total': total,
+        'insured_value': totals['insured_value'],
+    }
+
+
+def get_booking_costs(booking):
+    """
+    Returns the booking's stored costs, pricing it if they have not been
+    stored or were invalidated. Confirmed bookings store their costs again,
+    so they are only priced once.
+    """
+
+    if booking.is_priced:
+        return {field: getattr(booking, field) for field in COST_FIELDS}
+
+    costs = price_booking(booking)
+
+    if booking.status == 'CONFIRMED':
+        for field, value in costs.items():
+            setattr(booking, field, value)
+        type(booking).objects.filter(pk=booking.pk).update(**costs)
+
+    return costs
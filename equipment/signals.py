@@ -0,0 +1,45 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Manufacturer, EquipmentBooking
+from .utils import clear_booking_calendar, clear_equipment_filterables, clear_pending_booking
+
+
+@receiver([post_save, post_delete], sender=EquipmentBooking)
+def clear_booking_calendar_for_booking(sender, instance, **kwargs):
+    """
+    Clears the cached calendar months of a changed booking, both where it is 
+    now and where it was when loaded, in case it has moved, once the change 
+    is committed. Changes to a booking's items touch the booking, so clear 
+    its months too.
+    """
+
+    transaction.on_commit(partial(clear_booking_calendar, instance.period, instance._loaded_period))
+    instance._loaded_period = instance.period
+
+
+@receiver([post_save, post_delete], sender=EquipmentBooking)
+def clear_pending_booking_for_booking(sender, instance, **kwargs):
+    """
+    Clears the cached pending booking of a changed booking's creator, as the 
+    booking may have been created, confirmed or cancelled. Cleared once the 
+    change is committed, so requests in between cannot cache the old state 
+    again.
+    """
+
+    if instance.created_by_id:
+        transaction.on_commit(partial(clear_pending_booking, instance.created_by_id))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Manufacturer)
+def clear_filterables_for_change(sender, instance, **kwargs):
+    """
+    Clears the cached category and manufacturer lists when either changes, 
+    once the change is committed.
+    """
+
+    transaction.on_commit(clear_equipment_filterables)
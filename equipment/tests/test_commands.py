@@ -0,0 +1,248 @@
+import os, tempfile, zipfile
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from equipment.models import (
+    Manufacturer, 
+    Category, 
+    Item, 
+    EquipmentBooking, 
+    EquipmentBookingItem, 
+    ItemValuationSnapshot, 
+    CategoryValuationSnapshot
+)
+from equipment.utils import get_booking_calendar, get_cached_equipment_filterables
+
+
+class EquipmentCommandsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        # Create Manufacturer
+        cls.manufacturer = Manufacturer.objects.create(
+            name = 'Test Manufacturer',
+        )
+
+        # Create Category
+        cls.category = Category.objects.create(
+            name = 'Test Category',
+        )
+
+
+    def write_file(self, content, suffix='.csv'):
+        """
+        Writes content to a temporary file, returning its path.
+        """
+
+        file_descriptor, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(file_descriptor, 'w') as temp_file:
+            temp_file.write(content)
+        self.addCleanup(os.remove, path)
+
+        return path
+
+
+    # Import Items
+    def test_import_items(self):
+        """
+        Tests items are imported in batches, with barcodes reserved for rows 
+        without one and duplicate barcodes skipped.
+        """
+
+        rows = ['category,manufacturer,name,barcode,purchase_cost,hire_day_rate']
+        rows += [f'Test Category,Test Manufacturer,Item {number},,100,10' for number in range(25)]
+        rows += [
+            'Test Category,Test Manufacturer,Barcoded Item,5012345678900,100,10',
+            'Test Category,Test Manufacturer,Duplicate Item,5012345678900,100,10',
+            'Test Category,Test Manufacturer,,,100,10',
+        ]
+        path = self.write_file('\n'.join(rows))
+        stdout, stderr = StringIO(), StringIO()
+
+        # Dry run creates nothing, and finds duplicates across batches
+        call_command('import_items', path, '--dry-run', '--batch-size', '26', stdout=stdout, stderr=stderr)
+        self.assertFalse(Item.objects.exists())
+        self.assertIn('Validated 26 items, skipped 2 rows.', stdout.getvalue())
+        self.assertIn('Line 28: barcode', stderr.getvalue())
+
+        call_command('import_items', path, '--batch-size', '10', stdout=stdout, stderr=stderr)
+
+        self.assertEqual(Item.objects.count(), 26)
+        self.assertEqual(Item.objects.filter(barcode='5012345678900').get().name, 'Barcoded Item')
+        self.assertEqual(Item.objects.values('barcode').distinct().count(), 26)
+        self.assertIn('Imported 26 items, skipped 2 rows.', stdout.getvalue())
+        self.assertIn('Line 28: barcode', stderr.getvalue())
+        self.assertIn('Line 29: name', stderr.getvalue())
+
+
+    def test_import_items_reserved_barcode_taken(self):
+        """
+        Tests a barcode reserved for a row without one is re-reserved if 
+        another row in the file has already given it.
+        """
+
+        # Rewind the sequence so the next reserved barcode is a known one
+        next_barcode = Item.reserve_barcodes(1)[0]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT setval('equipment_item_barcode_seq', %s, false)", 
+                [int(next_barcode[1:12])],
+            )
+
+        rows = ['category,manufacturer,name,barcode,purchase_cost,hire_day_rate']
+        rows += [
+            f'Test Category,Test Manufacturer,Barcoded Item,{next_barcode},100,10',
+            'Test Category,Test Manufacturer,Item,,100,10',
+        ]
+        path = self.write_file('\n'.join(rows))
+        stdout, stderr = StringIO(), StringIO()
+
+        call_command('import_items', path, stdout=stdout, stderr=stderr)
+
+        self.assertEqual(Item.objects.get(barcode=next_barcode).name, 'Barcoded Item')
+        self.assertEqual(Item.objects.values('barcode').distinct().count(), 2)
+        self.assertIn('Imported 2 items, skipped 0 rows.', stdout.getvalue())
+
+
+    # Snapshot Valuations
+    def test_snapshot_valuations(self):
+        """
+        Tests item and category valuations are snapshotted for a date, and 
+        that re-running only recomputes items changed since.
+        """
+
+        today = timezone.localdate()
+        for number in range(3):
+            Item.objects.create(
+                name = f'Item {number}',
+                category = self.category,
+                purchase_date = today - timedelta(days=365),
+                purchase_cost = 100.00,
+            )
+        uncategorised = Item.objects.create(name = 'Uncategorised Item', purchase_cost = 50.00)
+        stdout = StringIO()
+
+        call_command('snapshot_valuations', '--date', today.isoformat(), stdout=stdout)
+        self.assertIn(f'Snapshotted 4 items as of {today}.', stdout.getvalue())
+
+        category_total = CategoryValuationSnapshot.objects.get(date=today, category=self.category)
+        self.assertEqual(category_total.item_count, 3)
+        self.assertAlmostEqual(category_total.purchase_cost, 300.0)
+        self.assertAlmostEqual(category_total.depreciated_value, 240.0, places=0)
+        self.assertAlmostEqual(
+            CategoryValuationSnapshot.objects.get(date=today, category=None).depreciated_value, 50.0
+        )
+
+        # Unchanged items are skipped, and deleted items dropped
+        call_command('snapshot_valuations', '--date', today.isoformat(), stdout=stdout)
+        self.assertIn(f'Snapshotted 0 items as of {today}.', stdout.getvalue())
+
+        uncategorised.delete()
+        call_command('snapshot_valuations', '--date', today.isoformat(), stdout=stdout)
+        self.assertEqual(ItemValuationSnapshot.objects.filter(date=today).count(), 3)
+        self.assertEqual(CategoryValuationSnapshot.objects.filter(date=today).count(), 1)
+
+        # Items are only valued on dates they were held
+        yesterday = today - timedelta(days=1)
+        call_command('snapshot_valuations', '--date', yesterday.isoformat(), '--full', stdout=stdout)
+        self.assertIn(f'Snapshotted 0 items as of {yesterday}.', stdout.getvalue())
+
+
+    # Invoice Bookings
+    def test_invoice_bookings(self):
+        """
+        Tests confirmed bookings in the date range are invoiced to a document 
+        or a zip, with invoice numbers allocated once.
+        """
+
+        item = Item.objects.create(name = 'Test Item', category = self.category, hire_day_rate = 25.00)
+        start_at = timezone.now().replace(day=1) - timedelta(days=60)
+
+        for number in range(3):
+            booking = EquipmentBooking.objects.create(
+                job_reference = f'Job {number}',
+                start_at = start_at + timedelta(days=number * 7),
+                end_at = start_at + timedelta(days=number * 7 + 2),
+                status = 'CONFIRMED',
+            )
+            EquipmentBookingItem.objects.create(equipment_booking = booking, item = item)
+
+        EquipmentBooking.objects.create(
+            job_reference = 'Cancelled Job',
+            start_at = start_at,
+            end_at = start_at + timedelta(days=1),
+            status = 'CANCELLED',
+        )
+
+        date_range = [
+            '--start', start_at.date().isoformat(), 
+            '--end', (start_at + timedelta(days=30)).date().isoformat(),
+        ]
+        stdout = StringIO()
+
+        path = self.write_file('', suffix='.zip')
+        call_command('invoice_bookings', path, *date_range, stdout=stdout)
+        self.assertIn('Wrote 3 invoices', stdout.getvalue())
+
+        invoice_numbers = set(
+            EquipmentBooking.objects.filter(status='CONFIRMED').values_list('invoice_number', flat=True)
+        )
+        self.assertEqual(len(invoice_numbers), 3)
+        self.assertFalse(EquipmentBooking.objects.get(status='CANCELLED').invoice_number)
+
+        with zipfile.ZipFile(path) as invoices_zip:
+            self.assertEqual(
+                {name[:-len('.html')] for name in invoices_zip.namelist()}, 
+                invoice_numbers,
+            )
+            invoice = invoices_zip.read(f'{min(invoice_numbers)}.html').decode()
+            self.assertIn('£50.00', invoice)
+
+        # Numbers are kept when bookings are invoiced again
+        path = self.write_file('', suffix='.html')
+        call_command('invoice_bookings', path, *date_range, stdout=stdout)
+        self.assertEqual(
+            set(EquipmentBooking.objects.values_list('invoice_number', flat=True)) - {None}, 
+            invoice_numbers,
+        )
+
+        with open(path) as invoices_file:
+            document = invoices_file.read()
+        for invoice_number in invoice_numbers:
+            self.assertIn(invoice_number, document)
+
+        # PDF invoices are rendered across processes
+        path = self.write_file('', suffix='.zip')
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(INVOICE_PDF_CACHE_DIR=cache_dir):
+            call_command('invoice_bookings', path, *date_range, '--pdf', '--workers', '2', stdout=stdout)
+            self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+        with zipfile.ZipFile(path) as invoices_zip:
+            self.assertEqual(
+                {name[:-len('.pdf')] for name in invoices_zip.namelist()}, 
+                invoice_numbers,
+            )
+            self.assertTrue(invoices_zip.read(f'{min(invoice_numbers)}.pdf').startswith(b'%PDF-'))
+
+
+    def test_warm_caches(self):
+        """
+        Tests the filterables and calendar months are cached by the command, 
+        so the next reads run no queries.
+        """
+
+        stdout = StringIO()
+
+        call_command('warm_caches', '--months', '2', stdout=stdout)
+        self.assertIn('2 calendar months', stdout.getvalue())
+
+        today = timezone.localdate()
+        with self.assertNumQueries(0):
+            get_cached_equipment_filterables()
+            get_booking_calendar(today.year, today.month)
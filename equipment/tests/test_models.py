@@ -1,15 +1,20 @@
 from datetime import timedelta
 
 from django.test import TestCase
+from django.db import IntegrityError, connection, transaction
+from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from equipment import filters, pricing
+from equipment.utils import clear_equipment_filterables, get_cached_equipment_filterables
 from equipment.models import (
     Manufacturer, 
     Category, 
     Item, 
     EquipmentBooking, 
-    EquipmentBookingItem
+    EquipmentBookingItem,
+    Kit,
 )
 
 class EquipmentModelsTest(TestCase):
@@ -45,7 +50,7 @@ class EquipmentModelsTest(TestCase):
             serial_number = 'TI-1234567',
             notes = 'Some useful test notes.',
             assigned_to = self.test_user,
-            purchase_date = timezone.now().date(),
+            purchase_date = timezone.localdate(),
             purchase_cost = 200.00,
             hire_day_rate = 50.00
         )
@@ -123,6 +128,34 @@ class EquipmentModelsTest(TestCase):
         self.assertEqual(self.item.hire_day_rate, 50.00)
 
 
+    def test_item_barcode_allocation(self):
+        """
+        Tests new items are given a unique, valid EAN-13 barcode as part of 
+        the insert, and that barcodes can be reserved in bulk.
+        """
+
+        def is_valid_ean13(barcode):
+            digits = [int(digit) for digit in barcode]
+            total = sum(digit * (3 if index % 2 else 1) for index, digit in enumerate(digits[:12]))
+            return len(barcode) == 13 and (10 - total % 10) % 10 == digits[12]
+
+        with self.assertNumQueries(1):
+            item = Item.objects.create(name = 'Barcoded Item')
+
+        self.assertTrue(is_valid_ean13(item.barcode))
+        self.assertTrue(is_valid_ean13(self.item.barcode))
+        self.assertNotEqual(item.barcode, self.item.barcode)
+
+        # Blank barcodes are replaced
+        item.barcode = None
+        item.save()
+        self.assertTrue(is_valid_ean13(item.barcode))
+
+        barcodes = Item.reserve_barcodes(5)
+        self.assertEqual(len(set(barcodes)), 5)
+        self.assertTrue(all(is_valid_ean13(barcode) for barcode in barcodes))
+
+
     def test_item_string_method(self):
         """
         Tests item object string method.
@@ -169,4 +202,445 @@ class EquipmentModelsTest(TestCase):
         Tests equipment booking item object string method.
         """
         
-        self.assertEqual(str(self.booking_item), str(self.booking_item.id))  
\ No newline at end of file
+        self.assertEqual(str(self.booking_item), str(self.booking_item.id))
+
+
+    def test_booking_verify_booking(self):
+        """
+        Tests booking verification reports every conflicting item in a 
+        single query.
+        """
+
+        second_item = Item.objects.create(
+            category = self.category,
+            manufacturer = self.manufacturer,
+            name = 'Second Test Item',
+        )
+        EquipmentBookingItem.objects.create(
+            equipment_booking = self.booking,
+            item = second_item,
+        )
+
+        # No conflicts
+        with self.assertNumQueries(2):
+            self.assertTrue(self.booking.verify_booking())
+
+        # Cancelled bookings do not conflict
+        cancelled_booking = EquipmentBooking.objects.create(
+            created_by = self.test_user,
+            job_reference = 'Cancelled Booking',
+            start_at = self.booking.start_at + timedelta(hours=2),
+            end_at = self.booking.end_at + timedelta(hours=2),
+            status = 'CANCELLED',
+        )
+        EquipmentBookingItem.objects.create(
+            equipment_booking = cancelled_booking,
+            item = self.item,
+        )
+        self.assertTrue(self.booking.verify_booking())
+
+        # Reinstating a cancelled booking reports every item it clashes on
+        EquipmentBookingItem.objects.create(
+            equipment_booking = cancelled_booking,
+            item = second_item,
+        )
+
+        with self.assertNumQueries(2):
+            with self.assertRaises(ValidationError) as context:
+                cancelled_booking.verify_booking()
+
+        self.assertEqual(len(context.exception.messages), 2)
+        self.assertIn('Test Booking', context.exception.messages[0])
+        self.assertIn('Test Booking', context.exception.messages[1])
+
+        # Empty bookings are invalid
+        self.booking.booking_items.all().delete()
+        with self.assertRaisesMessage(ValidationError, 'Bookings must contain at least one item.'):
+            self.booking.verify_booking()
+
+
+    def test_booking_item_overlap_constraint(self):
+        """
+        Tests the database rejects booking an item that is already held by an 
+        overlapping pending or confirmed booking.
+        """
+
+        clashing_booking = EquipmentBooking.objects.create(
+            created_by = self.test_user,
+            job_reference = 'Clashing Booking',
+            start_at = self.booking.start_at + timedelta(hours=2),
+            end_at = self.booking.end_at + timedelta(hours=2),
+            status = 'CONFIRMED',
+        )
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                EquipmentBookingItem.objects.create(
+                    equipment_booking = clashing_booking,
+                    item = self.item,
+                )
+
+        # Adjacent bookings do not overlap
+        clashing_booking.start_at = self.booking.end_at
+        clashing_booking.end_at = self.booking.end_at + timedelta(days=1)
+        clashing_booking.save()
+        EquipmentBookingItem.objects.create(
+            equipment_booking = clashing_booking,
+            item = self.item,
+        )
+
+        # Moving a booking onto a held item is rejected
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                clashing_booking.start_at = self.booking.start_at
+                clashing_booking.save()
+
+        # Cancelling a booking releases its items
+        self.booking.cancel()
+        self.assertFalse(self.booking.booking_items.get().active)
+        clashing_booking.refresh_from_db()
+        clashing_booking.start_at = self.booking.start_at
+        clashing_booking.save()
+        self.assertEqual(clashing_booking.booking_items.get().period, clashing_booking.period)
+
+
+
+    def test_item_depreciation(self):
+        """
+        Tests items are valued by their depreciation method, in one query for 
+        the whole fleet.
+        """
+
+        purchase_date = timezone.localdate() - timedelta(days=1461)
+        as_of = purchase_date + timedelta(days=1461) # 4 years
+
+        methods = [method for method, label in Item.DEPRECIATION_CHOICES]
+        for method in methods:
+            Item.objects.create(
+                name = method,
+                depreciation_method = method,
+                purchase_date = purchase_date,
+                purchase_cost = 1000.00,
+            )
+        Item.objects.create(name = 'Undated', purchase_cost = 1000.00)
+
+        # Ten days of completed hire
+        hire = EquipmentBooking.objects.create(
+            created_by = self.test_user,
+            job_reference = 'Completed Hire',
+            start_at = timezone.now() - timedelta(days=20),
+            end_at = timezone.now() - timedelta(days=10),
+            status = 'CONFIRMED',
+        )
+        EquipmentBookingItem.objects.create(
+            equipment_booking = hire,
+            item = Item.objects.get(name = 'UNITS-OF-PRODUCTION'),
+        )
+
+        with self.assertNumQueries(1):
+            values = dict(
+                Item.objects.with_depreciated_value(as_of
+                    ).exclude(pk=self.item.pk
+                    ).values_list('name', 'depreciated_value')
+            )
+
+        self.assertAlmostEqual(values['DECLINING-BALANCE'], 409.6, places=2)
+        self.assertAlmostEqual(values['STRAIGHT-LINE'], 200.0, places=2)
+        self.assertAlmostEqual(values['SUM-OF-YEARS'], 66.67, places=2)
+        self.assertAlmostEqual(values['UNITS-OF-PRODUCTION'], 990.0, places=2)
+        self.assertAlmostEqual(values['Undated'], 1000.0, places=2)
+
+        valuation = Item.objects.exclude(pk=self.item.pk).valuation(as_of)
+        self.assertAlmostEqual(valuation['total_cost'], 5000.0)
+        self.assertAlmostEqual(valuation['total_value'], sum(values.values()), places=2)
+
+        # Single items are valued in Python, by the same formulas
+        for item in Item.objects.exclude(pk=self.item.pk):
+            self.assertAlmostEqual(item.calculate_depreciation(as_of), values[item.name], places=2)
+
+        # Items bought today have not depreciated
+        with self.assertNumQueries(0):
+            self.assertAlmostEqual(self.item.calculate_depreciation(), 200.0)
+
+        # Unsaved items and unsaved changes are valued as they are in memory
+        self.item.depreciation_method = 'STRAIGHT-LINE'
+        self.item.purchase_date = as_of - timedelta(days=1461)
+        self.assertAlmostEqual(self.item.calculate_depreciation(as_of), 40.0, places=2)
+
+        unsaved_item = Item(
+            name = 'Unsaved', 
+            depreciation_method = 'UNITS-OF-PRODUCTION', 
+            purchase_cost = 500.00,
+        )
+        self.assertAlmostEqual(unsaved_item.calculate_depreciation(), 500.0)
+
+
+
+    def test_booking_costs(self):
+        """
+        Tests booking costs are priced in one query and stored on confirmation, 
+        and cleared when the booking's items or chargeable days change.
+        """
+
+        self.assertFalse(self.booking.is_priced)
+
+        with self.assertNumQueries(1):
+            costs = pricing.price_booking(self.booking)
+
+        self.assertEqual(costs, {
+            'chargeable_days': 1,
+            'sub_total': 50.0,
+            'vat_total': 8.75,
+            'total': 58.75,
+            'insured_value': 200.0,
+        })
+
+        self.booking.confirm()
+        self.booking.refresh_from_db()
+        self.assertTrue(self.booking.is_priced)
+        self.assertEqual(self.booking.total, 58.75)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.get_booking_costs(self.booking), costs)
+
+        # VAT changes are applied to the stored sub total
+        self.booking.vat_value = 20
+        self.booking.save()
+        self.assertEqual(self.booking.total, 60.0)
+
+        # Changing the chargeable days clears the stored costs
+        self.booking.end_at += timedelta(days=1)
+        self.booking.save()
+        self.booking.refresh_from_db()
+        self.assertFalse(self.booking.is_priced)
+
+        # Confirmed bookings are priced again on read, and stored
+        self.assertEqual(pricing.get_booking_costs(self.booking)['sub_total'], 100.0)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.sub_total, 100.0)
+
+        # Changing the items clears the stored costs
+        self.booking_item.delete()
+        self.booking.refresh_from_db()
+        self.assertFalse(self.booking.is_priced)
+
+
+    def test_kit_availability(self):
+        """
+        Tests kit availability is counted in one query, and that kits are 
+        added to a booking with a single insert.
+        """
+
+        camera = Item.objects.create(name='Kit Camera', hire_day_rate=100)
+        lens = Item.objects.create(name='Kit Lens', hire_day_rate=25)
+        monitor = Item.objects.create(name='Kit Monitor')
+
+        camera_kit = Kit.objects.create(name='Camera Kit')
+        camera_kit.items.add(camera, lens)
+        monitor_kit = Kit.objects.create(name='Monitor Kit')
+        monitor_kit.items.add(monitor, self.item)
+        Kit.objects.create(name='Empty Kit')
+
+        booking = EquipmentBooking.objects.create(
+            created_by = self.test_user,
+            job_reference = 'Kit Booking',
+            start_at = timezone.now() + timedelta(days=7),
+            end_at = timezone.now() + timedelta(days=8),
+        )
+
+        with self.assertNumQueries(1):
+            kits = {kit.name: kit for kit in Kit.objects.with_availability(booking.period)}
+
+        self.assertTrue(kits['Camera Kit'].available)
+        self.assertEqual(kits['Camera Kit'].available_count, 2)
+        self.assertFalse(kits['Monitor Kit'].available)
+        self.assertEqual(kits['Monitor Kit'].available_count, 1)
+        self.assertFalse(kits['Empty Kit'].available)
+        self.assertEqual(kits['Empty Kit'].item_count, 0)
+
+        booking_items = camera_kit.add_to_booking(booking)
+
+        self.assertEqual(len(booking_items), 2)
+        self.assertEqual(
+            sorted(booking.booking_items.values_list('value', flat=True)), 
+            [25.0, 100.0],
+        )
+        self.assertFalse(Kit.objects.with_availability(booking.period).get(pk=camera_kit.pk).available)
+
+        # Kits already booked for an overlapping period are rejected
+        overlapping_booking = EquipmentBooking.objects.create(
+            created_by = self.test_user,
+            job_reference = 'Overlapping Kit Booking',
+            start_at = booking.start_at,
+            end_at = booking.end_at,
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            camera_kit.add_to_booking(overlapping_booking)
+
+
+    def test_equipment_filterables_cache(self):
+        """
+        Tests the category and manufacturer lists are cached as tuples, and 
+        rebuilt once either changes.
+        """
+
+        clear_equipment_filterables()
+
+        with self.assertNumQueries(2):
+            filterables = get_cached_equipment_filterables()
+
+        self.assertEqual(filterables['categories'], [(self.category.id, 'Test Category')])
+        self.assertEqual(filterables['manufacturers'][0].name, 'Test Manufacturer')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_equipment_filterables(), filterables)
+
+        # Cleared once the change is committed, not before
+        with self.captureOnCommitCallbacks(execute=True):
+            Manufacturer.objects.create(name='Another Manufacturer')
+
+            with self.assertNumQueries(0):
+                get_cached_equipment_filterables()
+
+        with self.assertNumQueries(2):
+            filterables = get_cached_equipment_filterables()
+
+        self.assertEqual(
+            [manufacturer.name for manufacturer in filterables['manufacturers']],
+            ['Another Manufacturer', 'Test Manufacturer'],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(get_cached_equipment_filterables()['categories'], [])
+
+
+class EquipmentIndexesTest(TestCase):
+    """
+    Checks the booking hot path queries are served by their indexes. 
+    Sequential scans are disabled, as the planner would otherwise prefer them 
+    on tables this small.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.test_user = get_user_model().objects.create_user(
+            first_name = 'Test',
+            last_name = 'User',
+            email = 'testuser@email.com',
+            password = 'testpass123'
+        )
+
+        cls.item = Item.objects.create(name = 'Test Item')
+
+        cls.booking = EquipmentBooking.objects.create(
+            created_by = cls.test_user,
+            job_reference = 'Test Booking',
+            start_at = timezone.now(),
+            end_at = timezone.now() + timedelta(days=1),
+            status = 'CONFIRMED',
+        )
+
+        EquipmentBookingItem.objects.create(
+            equipment_booking = cls.booking,
+            item = cls.item,
+        )
+
+
+    def setUp(self):
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+
+    def test_active_booking_window_index(self):
+        """
+        Tests status / date window queries use the partial active booking 
+        index.
+        """
+
+        now = timezone.now()
+        bookings = EquipmentBooking.objects.filter(
+            status='CONFIRMED',
+            start_at__lt=now + timedelta(days=7),
+            end_at__gt=now,
+        )
+
+        self.assertIn('equipment_booking_active_idx', bookings.explain())
+
+
+    def test_pending_booking_index(self):
+        """
+        Tests pending booking lookups use the partial pending booking index.
+        """
+
+        bookings = EquipmentBooking.objects.filter(
+            created_by=self.test_user,
+            status='PENDING',
+        )
+
+        self.assertIn('equipment_booking_pending_idx', bookings.explain())
+
+
+    def test_item_bookings_index(self):
+        """
+        Tests an item's upcoming bookings are found through the item / 
+        booking index.
+        """
+
+        booking_items = EquipmentBookingItem.objects.filter(
+            item=self.item,
+            equipment_booking__start_at__gte=timezone.now() - timedelta(days=1),
+            equipment_booking__status__in=['PENDING', 'CONFIRMED'],
+        )
+
+        self.assertIn('equipment_booking_item_idx', booking_items.explain())
+
+
+    def test_item_overlap_index(self):
+        """
+        Tests availability checks use the exclusion constraint's GiST index.
+        """
+
+        booking_items = EquipmentBookingItem.objects.active().overlapping(
+            self.booking.period
+        ).filter(item=self.item)
+
+        self.assertIn('exclude_overlapping_item_bookings', booking_items.explain())
+
+
+
+    def test_item_listing_index(self):
+        """
+        Tests the item query page ordering uses the item listing index.
+        """
+
+        items = Item.objects.filter(deleted=False).order_by('created_at')[:40]
+
+        self.assertIn('equipment_item_listing_idx', items.explain())
+
+
+    def test_item_search_indexes(self):
+        """
+        Tests item searches use the trigram indexes.
+        """
+
+        query_plan = filters.ItemFilter({'search': 'TI-123'}, queryset=Item.objects.all()).qs.explain()
+
+        self.assertIn('equipment_item_name_trgm_idx', query_plan)
+        self.assertIn('equipment_item_number_trgm_idx', query_plan)
+
+
+    def test_booking_search_index(self):
+        """
+        Tests booking searches use the job reference trigram index.
+        """
+
+        bookings = filters.EquipmentBookingFilter(
+            {'search': 'Test'}, 
+            queryset=EquipmentBooking.objects.all()
+        ).qs
+
+        self.assertIn('equipment_booking_ref_trgm_idx', bookings.explain())
+
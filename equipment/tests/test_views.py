@@ -1,18 +1,28 @@
-from datetime import timedelta
+import csv, os, tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.urls import reverse
 from django.utils import timezone
 
+from core.pagination import CursorPaginator
 from equipment.models import (
     Item, 
     Category, 
     Manufacturer, 
     EquipmentBooking, 
-    EquipmentBookingItem
+    EquipmentBookingItem,
+    CategoryValuationSnapshot,
+    Kit,
 )
+from equipment.invoices import write_invoice_pdfs
+from equipment.utils import clear_equipment_filterables, clear_pending_booking
 
 
 class EquipmentModelsTest(TestCase):
@@ -126,6 +136,62 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, 'Equipment Dashboard | Hephaestus')
 
 
+    def test_equipment_dashboard_date_periods(self):
+        """
+        Tests the header's date links use today in local time, as set by
+        the date periods context processor.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        today = timezone.localdate().isoformat()
+        response = self.client.get(reverse('equipment_dashboard'))
+        self.assertEqual(str(response.context['today']), today)
+        self.assertContains(response, f'?date_range_start={today}&date_range_end={today}')
+
+
+    def test_pending_booking_resolved_once(self):
+        """
+        Tests the pending booking is looked up at most once per request, 
+        cached for users without one, and cleared when bookings change.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        url = reverse('equipment_item_query')
+        clear_equipment_filterables()
+        clear_pending_booking(self.user.pk)
+
+        # Auth, pending booking, count, items, filterables (2)
+        with self.assertNumQueries(9):
+            response = self.client.get(url)
+        self.assertContains(response, 'New Booking')
+
+        # Users without a pending booking are cached
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending_booking = EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = 'Pending Job',
+                start_at = self.booking.start_at,
+                end_at = self.booking.end_at,
+            )
+
+        # Auth, pending booking, count, items, availability
+        with self.assertNumQueries(8):
+            response = self.client.get(url)
+        self.assertContains(response, 'Pending Booking')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending_booking.delete()
+        response = self.client.get(url)
+        self.assertContains(response, 'New Booking')
+
+
     # Equipment Query View
     def test_item_query_logged_out(self):
         """
@@ -184,6 +250,113 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, 'Test Item 2')
         self.assertNotContains(response, 'Test Item 1')
 
+        # Test Fuzzy Serial Number Search
+        response = self.client.get(f'{reverse("equipment_item_query")}?search=TI-124')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Test Item 1')
+        self.assertNotContains(response, 'Test Item 2')
+
+
+    def test_item_query_availability(self):
+        """
+        Tests items held by an overlapping booking are marked unavailable 
+        against the user's pending booking.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        EquipmentBookingItem.objects.create(
+            equipment_booking = self.booking,
+            item = self.item,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = 'Pending Job',
+                start_at = self.booking.start_at + timedelta(hours=1),
+                end_at = self.booking.end_at + timedelta(hours=1),
+            )
+
+        response = self.client.get(reverse('equipment_item_query'))
+        self.assertEqual(response.status_code, 200)
+
+        availability = {item.name: item.available for item in response.context['item_query']}
+        self.assertEqual(availability, {'Test Item 1': False, 'Test Item 2': True})
+
+
+    def test_item_query_csv_export(self):
+        """
+        Tests the filtered item query can be streamed as CSV.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        response = self.client.get(f'{reverse("equipment_item_query")}?search=Test Item 2&format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:2], ['Barcode', 'Name'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1], 'Test Item 2')
+        self.assertEqual(rows[1][-1], 'True')
+
+
+    def test_item_query_cursor_pagination(self):
+        """
+        Tests the item query page can be keyset paginated with a cursor, 
+        whilst page numbers keep working.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        for number in range(43):
+            Item.objects.create(name = f'Paged Item {number}')
+
+        # Offset pagination
+        response = self.client.get(f'{reverse("equipment_item_query")}?page=2')
+        offset_page = [item.pk for item in response.context['item_query']]
+        self.assertEqual(len(offset_page), 5)
+
+        # Cursor pagination
+        response = self.client.get(f'{reverse("equipment_item_query")}?cursor=')
+        self.assertEqual(response.status_code, 200)
+        first_page = response.context['item_query']
+        self.assertEqual(len(first_page), 40)
+        self.assertFalse(first_page.has_previous())
+        self.assertEqual(first_page.paginator.count, 45)
+
+        # The count is read from the cache once per paginator
+        with mock.patch('core.pagination.cache') as count_cache:
+            first_page.paginator.count, first_page.paginator.num_pages
+        count_cache.get_or_set.assert_not_called()
+
+        # Querysets that can never match have no SQL to key the count on
+        empty_paginator = CursorPaginator(Item.objects.filter(id__in=[]), 40, ['name'])
+        self.assertEqual(empty_paginator.count, 0)
+        self.assertEqual(empty_paginator.num_pages, 1)
+
+        response = self.client.get(f'{reverse("equipment_item_query")}?cursor={first_page.next_page_number()}')
+        second_page = response.context['item_query']
+        self.assertEqual([item.pk for item in second_page], offset_page)
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(second_page.start_index(), 41)
+        self.assertFalse(second_page.has_next())
+
+        response = self.client.get(f'{reverse("equipment_item_query")}?cursor={second_page.previous_page_number()}')
+        self.assertEqual(
+            [item.pk for item in response.context['item_query']], 
+            [item.pk for item in first_page],
+        )
+
+        response = self.client.get(f'{reverse("equipment_item_query")}?cursor={first_page.paginator.last_page}')
+        self.assertEqual([item.pk for item in response.context['item_query']], offset_page)
+
 
     # Equipment Item Detail
     def test_item_detail_logged_out(self):
@@ -231,6 +404,159 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, 'Test Item 1')
         
    
+    # Equipment Item Scan
+    def test_item_scan_logged_out(self):
+        """
+        Tests if user is redirected to login when signed out whilst trying to 
+        scan items.
+        """
+        
+        self.client.logout()
+        
+        response = self.client.get(reverse('equipment_item_scan'))
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(response, f"{reverse('account_login')}?next=/item-scan/")
+
+
+    def test_item_scan_logged_in_no_perm(self):
+        """
+        Tests 403 response is returned when user is logged in without 
+        permission and tries to scan items.
+        """
+
+        self.client.login(email="testuser@email.com", password="testpass123")        
+        
+        response = self.client.get(reverse('equipment_item_scan'))
+        self.assertEqual(response.status_code, 403)
+
+
+    def test_item_scan_logged_in_with_perm(self):
+        """
+        Tests a batch of barcodes is resolved to items and their current 
+        availability.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        # Missing barcodes
+        response = self.client.get(reverse('equipment_item_scan'))
+        self.assertEqual(response.status_code, 400)
+
+        # Item one is currently out on a booking
+        current_booking = EquipmentBooking.objects.create(
+            created_by = self.user,
+            job_reference = 'Current Job',
+            start_at = timezone.now() - timedelta(hours=1),
+            end_at = timezone.now() + timedelta(hours=1),
+            status = 'CONFIRMED',
+        )
+        EquipmentBookingItem.objects.create(
+            equipment_booking = current_booking,
+            item = self.item,
+        )
+
+        with self.assertNumQueries(5):  # Session, user, permissions (2), items
+            response = self.client.get(
+                f"{reverse('equipment_item_scan')}?barcode={self.item.barcode},{self.item_two.barcode}&barcode=0000000000000"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        items = {item['name']: item for item in data['items']}
+        self.assertFalse(items['Test Item 1']['available'])
+        self.assertEqual(items['Test Item 1']['current_booking'], 'Current Job')
+        self.assertTrue(items['Test Item 2']['available'])
+        self.assertEqual(data['not_found'], ['0000000000000'])
+
+
+    # Equipment Item Availability
+    def test_item_availability(self):
+        """
+        Tests free items of a category are found for a window in a single 
+        query, and that they are all added to the pending booking at once.
+        """
+
+        self.user.user_permissions.add(self.view_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        start_at = timezone.now() + timedelta(days=10)
+        end_at = start_at + timedelta(days=2)
+
+        booked_booking = EquipmentBooking.objects.create(
+            created_by = self.user,
+            job_reference = 'Booked Job',
+            start_at = start_at + timedelta(days=1),
+            end_at = end_at + timedelta(days=1),
+            status = 'CONFIRMED',
+        )
+        EquipmentBookingItem.objects.create(equipment_booking=booked_booking, item=self.item)
+
+        free_items = [
+            Item.objects.create(category=self.category, name=f'Free Item {number}', hire_day_rate=10)
+            for number in range(3)
+        ]
+        Item.objects.create(category=self.category, name='Deleted Item', deleted=True)
+        Item.objects.create(category=self.category, name='Assigned Item', assigned_to=self.user)
+
+        url = reverse('equipment_item_availability')
+        params = {
+            'category': self.category.pk,
+            'start_at': start_at.strftime('%Y-%m-%d %H:%M'),
+            'end_at': end_at.strftime('%Y-%m-%d %H:%M'),
+            'quantity': 5,
+        }
+
+        with self.assertNumQueries(6):  # Session, user, permissions (2), category, items
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [item['name'] for item in data['items']], 
+            ['Free Item 0', 'Free Item 1', 'Free Item 2', 'Test Item 2'],
+        )
+        self.assertEqual(data['shortfall'], 1)
+
+        # A category or manufacturer is required
+        response = self.client.get(url, {**params, 'category': ''})
+        self.assertEqual(response.status_code, 400)
+
+        # Adding needs permission, and a pending booking
+        response = self.client.post(url, params)
+        self.assertEqual(response.status_code, 403)
+
+        self.user.user_permissions.add(self.add_booking)
+        response = self.client.post(url, params)
+        self.assertEqual(response.status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending_booking = EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = 'Pending Job',
+                start_at = start_at,
+                end_at = end_at,
+            )
+
+        response = self.client.post(url, {**params, 'quantity': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['added'])
+        self.assertEqual(
+            set(pending_booking.booking_items.values_list('item', flat=True)),
+            {item.pk for item in free_items[:2]},
+        )
+        self.assertEqual(
+            pending_booking.booking_items.get(item=free_items[0]).value, 10,
+        )
+
+        # Items in the pending booking are no longer free
+        response = self.client.get(url, params)
+        self.assertEqual(
+            [item['name'] for item in response.json()['items']], 
+            ['Free Item 2', 'Test Item 2'],
+        )
+
+
     # Equipment Create Item View
     def test_equipment_create_item_logged_out(self):
         """
@@ -296,6 +622,66 @@ class EquipmentModelsTest(TestCase):
             self.fail("Multiple instances of Item were created.")
         
 
+    # Equipment Import Items View
+    def test_equipment_import_items_logged_out(self):
+        """
+        Tests if user is redirected to login when signed out whilst trying to 
+        access the import items page.
+        """
+        
+        self.client.logout()
+        
+        response = self.client.get(reverse('equipment_import_items'))
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(response, f"{reverse('account_login')}?next=/import-items/")
+
+
+    def test_equipment_import_items_logged_in_no_perm(self):
+        """
+        Tests 403 response is returned when user is logged in without 
+        permission and tries to access the import items page.
+        """
+
+        self.client.login(email="testuser@email.com", password="testpass123")        
+        
+        response = self.client.get(reverse('equipment_import_items'))
+        self.assertEqual(response.status_code, 403)
+
+
+    def test_equipment_import_items_logged_in_with_perm(self):
+        """
+        Tests items are imported from an uploaded CSV file, with invalid rows 
+        reported.
+        """
+
+        self.user.user_permissions.add(self.add_item)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        # GET
+        response = self.client.get(reverse('equipment_import_items'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'equipment/import-items.html')
+        self.assertContains(response, 'Equipment Import Items | Hephaestus')
+
+        # POST
+        csv_file = SimpleUploadedFile('items.csv', (
+            'category,manufacturer,name,serial_number,purchase_cost,hire_day_rate,last_service_date,service_interval_period\n'
+            'test category,Test Manufacturer,Imported Item,IMP-1,100,10,2024-01-01,3 Months\n'
+            'Unknown,Test Manufacturer,Bad Item,IMP-2,100,10,,\n'
+        ).encode())
+
+        response = self.client.post(reverse('equipment_import_items'), data={'file': csv_file})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['import_errors'], [(3, ["category: Unknown category 'Unknown'."])])
+
+        item = Item.objects.get(name='Imported Item')
+        self.assertEqual(item.category, self.category)
+        self.assertEqual(item.created_by, self.user)
+        self.assertEqual(item.service_due_date, date(2024, 3, 31))
+        self.assertEqual(len(item.barcode), 13)
+        self.assertFalse(Item.objects.filter(name='Bad Item').exists())
+
+
     # Equipment Update Item View
     def test_equipment_update_item_logged_out(self):
         """
@@ -532,6 +918,120 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, 'Test Job')
 
 
+    # Bulk Add / Remove Booking Items
+    def test_bulk_add_remove_booking_items(self):
+        """
+        Tests a list of items are checked in one query and added to or 
+        removed from the pending booking at once, with a result for each.
+        """
+
+        self.user.user_permissions.add(self.add_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        add_url = reverse('equipment_booking_add_items')
+        remove_url = reverse('equipment_booking_remove_items')
+
+        # No pending booking
+        response = self.client.post(add_url, {'item': [self.item.pk]})
+        self.assertEqual(response.status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending_booking = EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = 'Pending Job',
+                start_at = self.booking.start_at,
+                end_at = self.booking.end_at,
+            )
+        EquipmentBookingItem.objects.create(equipment_booking=self.booking, item=self.item_two)
+        extra_items = [Item.objects.create(name=f'Bulk Item {number}') for number in range(3)]
+
+        references = [
+            str(self.item.pk),
+            f'{self.item_two.barcode},{extra_items[0].barcode}',
+            str(extra_items[1].pk),
+            self.item.barcode,
+            '0000000000000',
+        ]
+
+        # Session, user, permissions (2), pending booking, items, then the 
+        # insert and booking update, each in a savepoint
+        with self.assertNumQueries(12):
+            response = self.client.post(add_url, {'item': references})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['added'], 3)
+        self.assertEqual(
+            [result['result'] for result in data['results']],
+            ['added', 'unavailable', 'added', 'added', 'in_booking', 'not_found'],
+        )
+        self.assertEqual(
+            set(pending_booking.booking_items.values_list('item', flat=True)),
+            {self.item.pk, extra_items[0].pk, extra_items[1].pk},
+        )
+
+        response = self.client.post(remove_url, {'item': [self.item.barcode, str(extra_items[2].pk)]})
+        data = response.json()
+        self.assertEqual(data['removed'], 1)
+        self.assertEqual(
+            [result['result'] for result in data['results']],
+            ['removed', 'not_in_booking'],
+        )
+        self.assertEqual(pending_booking.booking_items.count(), 2)
+
+        # Only POST is allowed
+        response = self.client.get(add_url)
+        self.assertEqual(response.status_code, 405)
+
+
+    # Kits
+    def test_kit_query_and_add_kit(self):
+        """
+        Tests kits are listed on the item query with their availability for 
+        the pending booking, and that a kit is added to it as a unit.
+        """
+
+        self.user.user_permissions.add(self.view_item, self.add_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        kit = Kit.objects.create(name='Test Kit')
+        kit.items.add(self.item, self.item_two)
+
+        url = f"{reverse('equipment_item_query')}?show=kits"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'equipment/kit-query.html')
+        self.assertContains(response, 'Test Kit')
+        self.assertContains(response, 'Dates Required')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending_booking = EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = 'Pending Job',
+                start_at = self.booking.start_at,
+                end_at = self.booking.end_at,
+            )
+        EquipmentBookingItem.objects.create(equipment_booking=self.booking, item=self.item_two)
+
+        # Session, user, permissions (2), pending booking, kit count, kits
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, '1 of 2 Available')
+
+        # Kits are only added when all of their items are free
+        response = self.client.post(reverse('equipment_booking_add_kit', args=[kit.pk]))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertFalse(pending_booking.booking_items.exists())
+
+        self.booking.booking_items.all().delete()
+        response = self.client.post(reverse('equipment_booking_add_kit', args=[kit.pk]))
+        self.assertEqual(
+            set(pending_booking.booking_items.values_list('item', flat=True)),
+            {self.item.pk, self.item_two.pk},
+        )
+
+
     # Summary Confirm
     def test_booking_summary_confirm_logged_out(self):
         """
@@ -795,6 +1295,140 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, 'Booking Calendar | Hephaestus')
 
 
+    def test_booking_calendar_load(self):
+        """
+        Tests the calendar counts bookings and items out on every day a 
+        booking spans, from a cached aggregate cleared when bookings change.
+        """
+
+        self.user.user_permissions.add(self.view_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        booking = EquipmentBooking.objects.create(
+            created_by = self.user,
+            job_reference = 'Multi Day Job',
+            start_at = timezone.make_aware(datetime(2030, 3, 10, 9)),
+            end_at = timezone.make_aware(datetime(2030, 3, 12, 17)),
+            status = 'CONFIRMED',
+        )
+        EquipmentBookingItem.objects.create(equipment_booking=booking, item=self.item)
+
+        def day_load(response, day):
+            for days in response.context['month_obj'].values():
+                for day_data in days.values():
+                    if day_data['day'] == day:
+                        return day_data['bookings'], day_data['items']
+
+        url = f"{reverse('equipment_booking_calendar')}?period=2030-03"
+        response = self.client.get(url)
+        self.assertEqual(day_load(response, 9), (0, 0))
+        self.assertEqual(day_load(response, 10), (1, 1))
+        self.assertEqual(day_load(response, 12), (1, 1))
+        self.assertEqual(day_load(response, 13), (0, 0))
+
+        # Auth only, as the month and the lack of a pending booking are cached
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        # Adding items and moving bookings clear the cached months, once
+        # committed
+        with self.captureOnCommitCallbacks(execute=True):
+            EquipmentBookingItem.objects.create(equipment_booking=booking, item=self.item_two)
+            self.assertEqual(day_load(self.client.get(url), 11), (1, 1))
+        self.assertEqual(day_load(self.client.get(url), 11), (1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.start_at = timezone.make_aware(datetime(2030, 3, 31, 9))
+            booking.end_at = timezone.make_aware(datetime(2030, 4, 2, 9))
+            booking.save()
+        response = self.client.get(url)
+        self.assertEqual(day_load(response, 11), (0, 0))
+        self.assertEqual(day_load(response, 31), (1, 2))
+
+        response = self.client.get(f"{reverse('equipment_booking_calendar')}?period=2030-04")
+        self.assertEqual(day_load(response, 2), (1, 2))
+        self.assertEqual(day_load(response, 3), (0, 0))
+
+        # Days are local, so a booking just after midnight in summer time 
+        # is counted on that day only
+        EquipmentBooking.objects.create(
+            created_by = self.user,
+            job_reference = 'Early Job',
+            start_at = timezone.make_aware(datetime(2030, 7, 11, 0, 30)),
+            end_at = timezone.make_aware(datetime(2030, 7, 11, 1, 30)),
+            status = 'CONFIRMED',
+        )
+        response = self.client.get(f"{reverse('equipment_booking_calendar')}?period=2030-07")
+        self.assertEqual(day_load(response, 10), (0, 0))
+        self.assertEqual(day_load(response, 11), (1, 0))
+
+
+
+    # Booking Timeline
+    def test_booking_timeline_logged_in_with_perm(self):
+        """
+        Tests booking timeline page is returned when user is logged in 
+        with permission.
+        """
+
+        self.client.login(email="testuser@email.com", password="testpass123")
+        response = self.client.get(reverse('equipment_booking_timeline'))
+        self.assertEqual(response.status_code, 403)
+
+        self.user.user_permissions.add(self.view_booking)
+        response = self.client.get(reverse('equipment_booking_timeline'), {'scale': 'day', 'start': '2030-03-11'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'equipment/booking-timeline.html')
+        self.assertEqual(response.context['start_date'], date(2030, 3, 11))
+
+
+    def test_booking_timeline_data(self):
+        """
+        Tests the timeline returns pages of items with their booking 
+        intervals in the window, clipped to it, with two queries a page.
+        """
+
+        self.user.user_permissions.add(self.view_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        booking = EquipmentBooking.objects.create(
+            created_by = self.user,
+            job_reference = 'Timeline Job',
+            start_at = timezone.make_aware(datetime(2030, 3, 10, 12)),
+            end_at = timezone.make_aware(datetime(2030, 3, 12, 12)),
+            status = 'CONFIRMED',
+        )
+        EquipmentBookingItem.objects.create(equipment_booking=booking, item=self.item)
+        for number in range(60):
+            Item.objects.create(name = f'Timeline Item {number:02d}')
+
+        url = reverse('equipment_booking_timeline_data')
+
+        # Auth, items, bookings
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {'scale': 'week', 'start': '2030-03-13'})
+        data = response.json()
+
+        self.assertEqual(data['window']['start_at'][:10], '2030-03-11')
+        self.assertEqual(len(data['items']), 50)
+        self.assertEqual(data['items'][0]['name'], 'Test Item 1')
+        self.assertEqual(data['items'][1]['bookings'], [])
+
+        interval, = data['items'][0]['bookings']
+        self.assertEqual(interval['job_reference'], 'Timeline Job')
+        self.assertEqual(interval['left'], 0)
+        self.assertAlmostEqual(interval['width'], 1.5 / 7 * 100, places=2)
+
+        response = self.client.get(url, {'scale': 'week', 'start': '2030-03-13', 'cursor': data['next']})
+        data = response.json()
+        self.assertEqual(len(data['items']), 12)
+        self.assertIsNone(data['next'])
+
+        # Items can be filtered, and days show their own window
+        response = self.client.get(url, {'scale': 'day', 'start': '2030-03-12', 'search': 'Test Item 1'})
+        interval, = response.json()['items'][0]['bookings']
+        self.assertEqual(interval['width'], 50)
+
     # Booking Query View
     def test_booking_query_logged_out(self):
         """
@@ -855,6 +1489,28 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, 'Test Job')
 
 
+    def test_booking_query_csv_export(self):
+        """
+        Tests the filtered booking query can be streamed as CSV.
+        """
+
+        self.user.user_permissions.add(self.view_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        EquipmentBookingItem.objects.create(
+            equipment_booking = self.booking,
+            item = self.item,
+        )
+
+        response = self.client.get(f'{reverse("equipment_booking_query")}?search=Test&format=csv')
+        self.assertEqual(response.status_code, 200)
+
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], 'Test Job')
+        self.assertEqual(rows[1][7], '1')
+
+
     # Booking Detail
     def test_booking_detail_logged_out(self):
         """
@@ -902,6 +1558,39 @@ class EquipmentModelsTest(TestCase):
         self.assertContains(response, self.booking.job_reference)
 
 
+    def test_equipment_nav_shared(self):
+        """
+        Tests the booking pages use the shared nav, cached by the active link 
+        and whether the user has a pending booking, not per user.
+        """
+
+        self.user.user_permissions.add(self.view_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        for url_name in ('equipment_booking_detail', 'equipment_booking_cost'):
+            response = self.client.get(reverse(url_name, kwargs={'pk': self.booking.id}))
+            self.assertTemplateUsed(response, 'equipment/partials/nav.html')
+            self.assertTemplateUsed(response, 'equipment/partials/booking-nav.html')
+
+        response = self.client.get(reverse('equipment_booking_timeline'))
+        self.assertTemplateUsed(response, 'equipment/partials/nav.html')
+
+        # One fragment per active link and pending state, shared by all users
+        nav_key = make_template_fragment_key('equipment_nav', ['timeline', 'none'])
+        self.assertIsNotNone(cache.get(nav_key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = 'Pending Job',
+                start_at = self.booking.start_at,
+                end_at = self.booking.end_at,
+            )
+
+        response = self.client.get(reverse('equipment_booking_timeline'))
+        self.assertContains(response, 'Pending Booking')
+
+
     # Booking Costs
     def test_booking_costs_logged_out(self):
         """
@@ -988,9 +1677,176 @@ class EquipmentModelsTest(TestCase):
         self.user.user_permissions.add(self.view_booking)
         self.client.login(email="testuser@email.com", password="testpass123")       
         
-        response = self.client.get(reverse('equipment_booking_invoice', kwargs={'pk': self.booking.id}))
+        EquipmentBookingItem.objects.create(equipment_booking=self.booking, item=self.item)
+        self.booking.confirm()
+
+        # Confirmed bookings use their stored costs, fetching only the booking 
+        # and its items
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('equipment_booking_invoice', kwargs={'pk': self.booking.id}))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'equipment/booking-invoice.html')
         self.assertContains(response, f'Invoice - {self.booking.job_reference}')
         self.assertContains(response, 'Invoice')    
-        self.assertContains(response, self.booking.job_reference)
\ No newline at end of file
+        self.assertContains(response, self.booking.job_reference)
+
+
+    # Valuation Report
+    def test_valuation_report_logged_in_with_perm(self):
+        """
+        Tests the valuation report reads the latest category snapshot on or 
+        before the requested date.
+        """
+
+        today = timezone.localdate()
+        CategoryValuationSnapshot.objects.create(
+            date = today - timedelta(days=31),
+            category = self.category,
+            item_count = 2,
+            purchase_cost = 1000.00,
+            depreciated_value = 750.00,
+        )
+        CategoryValuationSnapshot.objects.create(
+            date = today,
+            category = self.category,
+            item_count = 2,
+            purchase_cost = 1000.00,
+            depreciated_value = 720.00,
+        )
+
+        self.client.login(email="testuser@email.com", password="testpass123")
+        response = self.client.get(reverse('equipment_valuation_report'))
+        self.assertEqual(response.status_code, 403)
+
+        self.user.user_permissions.add(self.view_item)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('equipment_valuation_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'equipment/valuation-report.html')
+        self.assertEqual(response.context['totals']['depreciated_value'], 720.00)
+
+        response = self.client.get(
+            reverse('equipment_valuation_report'), 
+            {'date': (today - timedelta(days=1)).isoformat()},
+        )
+        self.assertEqual(response.context['snapshot_date'], today - timedelta(days=31))
+        self.assertContains(response, '&pound;750.00')
+
+
+    # Booking Invoices
+    def test_booking_invoices_logged_in_with_perm(self):
+        """
+        Tests batch invoices are built with a fixed number of queries, however 
+        many bookings are invoiced.
+        """
+
+        self.user.user_permissions.add(self.view_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        EquipmentBookingItem.objects.create(equipment_booking=self.booking, item=self.item)
+
+        for number in range(5):
+            booking = EquipmentBooking.objects.create(
+                created_by = self.user,
+                job_reference = f'Batch Job {number}',
+                start_at = self.booking.end_at + timedelta(days=number),
+                end_at = self.booking.end_at + timedelta(days=number, hours=12),
+                status = 'CONFIRMED',
+            )
+            EquipmentBookingItem.objects.create(equipment_booking=booking, item=self.item_two)
+
+        today = timezone.localdate()
+        date_range = {
+            'date_range_start': today.isoformat(), 
+            'date_range_end': (today + timedelta(days=30)).isoformat(),
+        }
+
+        # Auth, count, bookings, totals, items
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('equipment_booking_invoices'), date_range)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'equipment/booking-invoices.html')
+        self.assertEqual(len(response.context['invoices']), 6)
+        self.assertContains(response, 'Batch Job 4')
+
+        # Viewing invoices does not number them
+        self.assertFalse(EquipmentBooking.objects.filter(invoice_number__isnull=False).exists())
+
+        # Batches are limited to a date range
+        response = self.client.get(reverse('equipment_booking_invoices'))
+        self.assertRedirects(response, f"{reverse('equipment_booking_query')}?")
+
+        # Issuing invoices needs permission to change bookings, and a POST
+        response = self.client.post(reverse('equipment_booking_invoices_issue'), date_range)
+        self.assertEqual(response.status_code, 403)
+
+        self.user.user_permissions.add(self.change_booking)
+        response = self.client.get(reverse('equipment_booking_invoices_issue'), date_range)
+        self.assertEqual(response.status_code, 405)
+
+        response = self.client.post(reverse('equipment_booking_invoices_issue'), date_range)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        invoice_numbers = set(EquipmentBooking.objects.values_list('invoice_number', flat=True))
+        self.assertEqual(len(invoice_numbers - {None}), 6)
+
+        # Numbers are kept when invoices are issued again
+        self.client.post(reverse('equipment_booking_invoices_issue'), date_range)
+        self.assertEqual(set(EquipmentBooking.objects.values_list('invoice_number', flat=True)), invoice_numbers)
+
+
+    def test_booking_invoice_pdf(self):
+        """
+        Tests invoice PDFs are rendered once and served from the cache until 
+        anything printed on them changes.
+        """
+
+        self.user.user_permissions.add(self.view_booking)
+        self.client.login(email="testuser@email.com", password="testpass123")
+
+        EquipmentBookingItem.objects.create(equipment_booking=self.booking, item=self.item)
+        url = f"{reverse('equipment_booking_invoice', kwargs={'pk': self.booking.id})}?format=pdf"
+
+        def get_pdf():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            return b''.join(response.streaming_content)
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(INVOICE_PDF_CACHE_DIR=cache_dir):
+            document = get_pdf()
+            self.assertTrue(document.startswith(b'%PDF-'))
+
+            # Auth, booking, items
+            with self.assertNumQueries(6):
+                self.assertEqual(get_pdf(), document)
+
+            # Changing the booking's items prices and renders it again
+            EquipmentBookingItem.objects.create(equipment_booking=self.booking, item=self.item_two)
+            with self.assertNumQueries(8):
+                priced_document = get_pdf()
+            self.assertNotEqual(priced_document, document)
+
+            # As do changes that do not touch the booking itself
+            self.item.name = 'Renamed Item'
+            self.item.save()
+            renamed_document = get_pdf()
+            self.assertNotEqual(renamed_document, priced_document)
+
+            EquipmentBooking.objects.filter(pk=self.booking.pk).update(invoice_number='INV-999999')
+            numbered_document = get_pdf()
+            self.assertNotEqual(numbered_document, renamed_document)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # A cached file removed before it is opened is rendered again
+            def write_and_remove_once(invoices, workers=None):
+                pdf_paths = write_invoice_pdfs(invoices, workers=workers)
+                if write_pdfs.call_count == 1:
+                    os.remove(pdf_paths[0])
+                return pdf_paths
+
+            with mock.patch('equipment.views.write_invoice_pdfs', side_effect=write_and_remove_once) as write_pdfs:
+                self.assertEqual(get_pdf(), numbered_document)
+            self.assertEqual(write_pdfs.call_count, 2)
@@ -7,7 +7,10 @@ urlpatterns = [
     path('', views.equipment_dashboard_view, name='equipment_dashboard'),
     path('item-query/', views.item_query_view, name='equipment_item_query'),
     path('item-detail/<str:pk>/', views.item_detail_view, name='equipment_item_detail'),
+    path('item-scan/', views.item_scan_view, name='equipment_item_scan'),
+    path('item-availability/', views.item_availability_view, name='equipment_item_availability'),
     path('create-item/', views.create_item_view, name='equipment_create_item'),
+    path('import-items/', views.import_items_view, name='equipment_import_items'),
     path('update-item/<str:pk>/', views.update_item_view, name='equipment_update_item'),
     path('update-item-service/<str:pk>/', views.update_item_service_view, name='equipment_update_service'),
     path('delete-item/<str:pk>/', views.delete_item_view, name='equipment_delete_item'),
@@ -23,9 +26,18 @@ urlpatterns = [
     path('booking-cancel/<str:pk>/', views.booking_cancel_view, name='equipment_booking_cancel'),
     path('booking-add/<str:pk>/', views.add_to_booking_view, name='equipment_booking_add_item'),
     path('booking-remove/<str:pk>/', views.remove_from_booking_view, name='equipment_booking_remove_item'),
+    path('booking-add-items/', views.bulk_add_to_booking_view, name='equipment_booking_add_items'),
+    path('booking-add-kit/<str:pk>/', views.add_kit_to_booking_view, name='equipment_booking_add_kit'),
+    path('booking-remove-items/', views.bulk_remove_from_booking_view, name='equipment_booking_remove_items'),
     path('booking-query/', views.booking_query_view, name='equipment_booking_query'),
     path('booking-calendar/', views.booking_calendar_view, name='equipment_booking_calendar'),
+    path('booking-timeline/', views.booking_timeline_view, name='equipment_booking_timeline'),
+    path('booking-timeline-data/', views.booking_timeline_data_view, name='equipment_booking_timeline_data'),
     path('booking-detail/<str:pk>/', views.booking_detail_view, name='equipment_booking_detail'),
     path('booking-cost/<str:pk>/', views.booking_cost_view, name='equipment_booking_cost'),
     path('booking-invoice/<str:pk>/', views.booking_invoice_view, name='equipment_booking_invoice'),
+    path('booking-invoices/', views.booking_invoices_view, name='equipment_booking_invoices'),
+    path('booking-invoices-issue/', views.booking_invoices_issue_view, name='equipment_booking_invoices_issue'),
+
+    path('valuation-report/', views.valuation_report_view, name='equipment_valuation_report'),
 ]
\ No newline at end of file
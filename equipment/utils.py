@@ -1,34 +1,75 @@
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
+
+from equipment.models import Category, Manufacturer, EquipmentBooking, EquipmentBookingItem
+
+
+EQUIPMENT_FILTERABLES_TIMEOUT = 60*60*24 #1 day, in secs
+EQUIPMENT_FILTERABLES_VERSION_KEY = 'equipment_filterables_version'
 
-from equipment.models import Category, Manufacturer, EquipmentBooking
+# Cache key and model of each filterable list
+EQUIPMENT_FILTERABLES = {
+    'categories': ('equipment_filterables_categories', Category),
+    'manufacturers': ('equipment_filterables_manufacturers', Manufacturer),
+}
+
+Filterable = namedtuple('Filterable', ['id', 'name'])
 
 
 def get_cached_equipment_filterables() -> dict:
     """
-    Returns dictionary of equipment data filterables, from cache.
+    Returns dictionary of equipment data filterables, as (id, name) tuples, 
+    from cache. The lists and the current version are read in a single round 
+    trip. Each list is stored with the version it was built for, so lists 
+    built before a change are ignored on every web node once the version is 
+    bumped, see clear_equipment_filterables().
     """
 
-    timeout_period = 60*60*24 #1 day, in mins
+    keys = [key for key, model in EQUIPMENT_FILTERABLES.values()]
+    cached = cache.get_many([EQUIPMENT_FILTERABLES_VERSION_KEY, *keys])
+
+    version = cached.get(EQUIPMENT_FILTERABLES_VERSION_KEY)
+    missing = {}
+    if version is None:
+        version = int(timezone.now().timestamp() * 1000000)
+        missing[EQUIPMENT_FILTERABLES_VERSION_KEY] = version
+
+    filterable_data = {}
+    for name, (key, model) in EQUIPMENT_FILTERABLES.items():
+        entry_version, rows = cached.get(key, (None, None))
 
-    all_equipment_categories = cache.get('all_equipment_categories')
-    if not all_equipment_categories:
-        all_equipment_categories = Category.objects.all()
-        cache.set('all_equipment_categories', all_equipment_categories, timeout=timeout_period) 
+        if entry_version != version:
+            rows = [Filterable(*row) for row in model.objects.order_by('name').values_list('id', 'name')]
+            missing[key] = (version, rows)
 
-    all_equipment_manufacturers = cache.get('all_equipment_manufacturers')
-    if not all_equipment_manufacturers:
-        all_equipment_manufacturers = Manufacturer.objects.all()
-        cache.set('all_equipment_manufacturers', all_equipment_manufacturers, timeout=timeout_period)
+        filterable_data[name] = rows
 
-    filterable_data = {
-        'categories': all_equipment_categories,
-        'manufacturers': all_equipment_manufacturers,
-    }
+    if missing:
+        cache.set_many(missing, timeout=EQUIPMENT_FILTERABLES_TIMEOUT)
 
     return filterable_data
 
 
+def clear_equipment_filterables():
+    """
+    Invalidates the cached filterables for every web node, by bumping their 
+    version.
+    """
+
+    try:
+        cache.incr(EQUIPMENT_FILTERABLES_VERSION_KEY)
+    except ValueError:
+        # No version cached, so the next read starts a new one
+        pass
+
+
 def has_pending_booking(user):
     """
     Returns pending booking if the user has one, or None if not.
@@ -43,4 +84,267 @@ def has_pending_booking(user):
     except ObjectDoesNotExist:
         has_pending_booking = None
 
-    return has_pending_booking
\ No newline at end of file
+    return has_pending_booking
+
+
+PENDING_BOOKING_TIMEOUT = 60*5 #5 mins, in secs
+
+# Cached for users known to have no pending booking
+NO_PENDING_BOOKING = ''
+
+
+def pending_booking_cache_key(user_id):
+    return f'pending_booking:{user_id}'
+
+
+def get_pending_booking(request, cached=True):
+    """
+    Returns the current user's pending booking, or None if they do not have 
+    one, resolved at most once per request. The id of each user's pending 
+    booking is cached, and cleared by the booking signals, so users without 
+    one cost no query. Pass cached=False where a stale answer matters, i.e. 
+    before creating or reopening a booking.
+    """
+
+    if hasattr(request, '_pending_booking'):
+        return request._pending_booking
+
+    user = request.user
+    pending_booking = None
+
+    if user.is_authenticated:
+        cache_key = pending_booking_cache_key(user.pk)
+        booking_id = cache.get(cache_key) if cached else None
+
+        if booking_id:
+            pending_booking = EquipmentBooking.objects.filter(
+                id=booking_id,
+                created_by=user,
+                status='PENDING',
+            ).first()
+
+        if booking_id is None or (booking_id and not pending_booking):
+            pending_booking = has_pending_booking(user)
+            cache.set(
+                cache_key, 
+                pending_booking.pk if pending_booking else NO_PENDING_BOOKING, 
+                timeout=PENDING_BOOKING_TIMEOUT,
+            )
+
+    request._pending_booking = pending_booking
+    return pending_booking
+
+
+def clear_pending_booking(user_id):
+    """
+    Clears a user's cached pending booking, after any of their bookings 
+    change.
+    """
+
+    cache.delete(pending_booking_cache_key(user_id))
+
+
+def split_references(values) -> list:
+    """
+    Returns the distinct references, in order, from values that can be 
+    repeated or comma separated, i.e. ?barcode=123&barcode=456,789.
+    """
+
+    return list(dict.fromkeys(
+        reference.strip()
+        for value in values
+        for reference in value.split(',')
+        if reference.strip()
+    ))
+
+
+def set_item_availability(items, booking=None) -> list:
+    """
+    Returns the given items as a list, with an `available` flag set on each.
+    Items are unavailable if assigned, or held by an active booking 
+    overlapping the given booking. Booked items are fetched in one query 
+    limited to the given items, so the cost scales with the page, not the 
+    catalogue.
+    """
+
+    items = list(items)
+    booked_item_ids = set()
+
+    if booking and items:
+        booked_item_ids = set(
+            EquipmentBookingItem.objects.active(
+            ).overlapping(booking.period
+            ).filter(item__in=[item.pk for item in items]
+            ).values_list('item', flat=True)
+        )
+
+    for item in items:
+        item.available = item.assigned_to_id is None and item.pk not in booked_item_ids
+
+    return items
+
+
+BOOKING_CALENDAR_TIMEOUT = 60*60*24 #1 day, in secs
+
+# Per-day confirmed bookings and items out, counting every day a booking 
+# spans. Days are generated as timestamps without a timezone, i.e. local 
+# midnights, which AT TIME ZONE then converts to instants in the local 
+# timezone.
+BOOKING_CALENDAR_SQL = f"""
+    SELECT day::date, COUNT(DISTINCT booking.id), COUNT(booking_item.id)
+    FROM generate_series(%(start)s::timestamp, %(end)s::timestamp, interval '1 day') AS day
+    LEFT JOIN {EquipmentBooking._meta.db_table} AS booking
+        ON booking.status = 'CONFIRMED'
+        AND booking.period && tstzrange(
+            day AT TIME ZONE %(timezone)s, 
+            (day + interval '1 day') AT TIME ZONE %(timezone)s, 
+            '[)'
+        )
+    LEFT JOIN {EquipmentBookingItem._meta.db_table} AS booking_item
+        ON booking_item.equipment_booking_id = booking.id
+    GROUP BY day
+    ORDER BY day
+"""
+
+
+def booking_calendar_cache_key(year, month):
+    return f'booking_calendar_{year}_{month:02d}'
+
+
+def get_booking_calendar(year, month) -> dict:
+    """
+    Returns the number of confirmed bookings and items out on each day of the 
+    month, as {day: {'bookings': n, 'items': n}}, from one aggregate query. 
+    Cached per month, see clear_booking_calendar().
+    """
+
+    cache_key = booking_calendar_cache_key(year, month)
+    booking_calendar = cache.get(cache_key)
+
+    if booking_calendar is None:
+        month_start = date(year, month, 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute(BOOKING_CALENDAR_SQL, {
+                'start': month_start,
+                'end': month_start + relativedelta(months=1, days=-1),
+                'timezone': timezone.get_current_timezone_name(),
+            })
+            booking_calendar = {
+                day.day: {'bookings': bookings, 'items': items} 
+                for day, bookings, items in cursor.fetchall()
+            }
+
+        cache.set(cache_key, booking_calendar, timeout=BOOKING_CALENDAR_TIMEOUT)
+
+    return booking_calendar
+
+
+def clear_booking_calendar(*periods):
+    """
+    Clears the cached calendar for every month the given booking periods 
+    touch.
+    """
+
+    cache_keys = set()
+
+    for period in periods:
+        if not period or not period.lower or not period.upper:
+            continue
+
+        month = timezone.localtime(period.lower).date().replace(day=1)
+        last_month = timezone.localtime(period.upper).date().replace(day=1)
+
+        while month <= last_month:
+            cache_keys.add(booking_calendar_cache_key(month.year, month.month))
+            month += relativedelta(months=1)
+
+    cache.delete_many(cache_keys)
+
+
+def get_load_level(items, busiest_day_items):
+    """
+    Returns the heatmap level for a day's items out, as a bootstrap 
+    background opacity.
+    """
+
+    for level in (10, 25, 50, 75):
+        if items <= busiest_day_items * level / 100:
+            return level
+
+    return 100
+
+
+TIMELINE_SCALES = {
+    'week': 7,
+    'day': 1,
+}
+
+
+def get_timeline_window(scale, start):
+    """
+    Returns the scale, first day, and local start / end datetimes of a 
+    timeline window. Week windows start on the Monday of the given date, and 
+    missing or invalid values default to this week.
+    """
+
+    if scale not in TIMELINE_SCALES:
+        scale = 'week'
+
+    try:
+        start_date = date.fromisoformat(start or '')
+    except ValueError:
+        start_date = timezone.localdate()
+
+    if scale == 'week':
+        start_date -= timedelta(days=start_date.weekday())
+
+    window_start = timezone.make_aware(datetime.combine(start_date, time.min))
+    window_end = timezone.make_aware(
+        datetime.combine(start_date + timedelta(days=TIMELINE_SCALES[scale]), time.min)
+    )
+
+    return scale, start_date, window_start, window_end
+
+
+def get_booking_timeline(items, window_start, window_end) -> dict:
+    """
+    Returns the pending and confirmed booking intervals of the given items 
+    that fall in the window, as {item id: [interval, ...]}, from one query. 
+    Intervals are clipped to the window, with their position along it as 
+    percentages.
+    """
+
+    window = DateTimeTZRange(window_start, window_end, '[)')
+    window_seconds = (window_end - window_start).total_seconds()
+
+    booking_items = EquipmentBookingItem.objects.active(
+        ).overlapping(window
+        ).filter(item__in=[item.pk for item in items]
+        ).order_by('equipment_booking__start_at'
+        ).values_list(
+            'item_id',
+            'equipment_booking_id',
+            'equipment_booking__job_reference',
+            'equipment_booking__status',
+            'equipment_booking__start_at',
+            'equipment_booking__end_at',
+        )
+
+    timeline = {item.pk: [] for item in items}
+
+    for item_id, booking_id, job_reference, status, start_at, end_at in booking_items:
+        offset = (max(start_at, window_start) - window_start).total_seconds()
+        length = (min(end_at, window_end) - max(start_at, window_start)).total_seconds()
+
+        timeline[item_id].append({
+            'booking': str(booking_id),
+            'job_reference': job_reference,
+            'status': status,
+            'start_at': start_at.isoformat(),
+            'end_at': end_at.isoformat(),
+            'left': round(offset / window_seconds * 100, 3),
+            'width': round(length / window_seconds * 100, 3),
+        })
+
+    return timeline
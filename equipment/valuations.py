@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+
+from .models import (
+    Item,
+    EquipmentBookingItem,
+    ItemValuationSnapshot,
+    CategoryValuationSnapshot,
+)
+
+
+def snapshot_valuations(as_of, batch_size=1000, full=False):
+    """
+    Writes item and category valuation snapshots for the given date, for the
+    items held on that date. Re-running for a date is idempotent, and only
+    recomputes items changed since their snapshot was taken, unless full is
+    set. Returns the number of item snapshots written.
+    """
+
+    held_items = Item.objects.filter(
+        Q(purchase_date__isnull=True) | Q(purchase_date__lte=as_of),
+        Q(deleted=False) | Q(deleted_at__date__gt=as_of),
+        created_at__date__lte=as_of,
+    )
+
+    items = held_items
+    if not full:
+        snapshots = ItemValuationSnapshot.objects.filter(item=OuterRef('pk'), date=as_of)
+
+        # Units of production values also change with the item's bookings
+        rebooked = EquipmentBookingItem.objects.filter(
+            item=OuterRef('item'),
+            equipment_booking__updated_at__gt=OuterRef('computed_at'),
+        )
+        current_snapshots = snapshots.filter(
+            computed_at__gte=OuterRef('updated_at'),
+        ).exclude(
+            Q(item__depreciation_method='UNITS-OF-PRODUCTION') & Exists(rebooked)
+        )
+        items = items.exclude(Exists(current_snapshots))
+
+    values = items.with_depreciated_value(as_of).values_list(
+        'id', 'category_id', 'purchase_cost', 'depreciated_value',
+    ).order_by().iterator(chunk_size=batch_size)
+
+    written = 0
+    batch = []
+
+    with transaction.atomic():
+
+        # Items no longer held on the date, i.e. deleted since, are dropped
+        ItemValuationSnapshot.objects.filter(date=as_of
+            ).exclude(item__in=held_items.values('id')
+            ).delete()
+
+        for item_id, category_id, purchase_cost, depreciated_value in values:
+            batch.append(ItemValuationSnapshot(
+                date=as_of,
+                item_id=item_id,
+                category_id=category_id,
+                purchase_cost=purchase_cost,
+                depreciated_value=depreciated_value,
+            ))
+
+            if len(batch) >= batch_size:
+                written += _write_item_snapshots(batch)
+                batch = []
+
+        written += _write_item_snapshots(batch)
+        _rollup_category_snapshots(as_of)
+
+    return written
+
+
+def _write_item_snapshots(batch):
+    """
+    Upserts a batch of item snapshots in a single query.
+    """
+
+    if batch:
+        ItemValuationSnapshot.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['date', 'item'],
+            update_fields=['computed_at', 'category', 'purchase_cost', 'depreciated_value'],
+        )
+
+    return len(batch)
+
+
+def _rollup_category_snapshots(as_of):
+    """
+    Replaces the category snapshots for the date with totals aggregated from
+    its item snapshots.
+    """
+
+    totals = ItemValuationSnapshot.objects.filter(date=as_of
+        ).values('category'
+        ).annotate(
+            item_count=Count('id'),
+            total_cost=Sum('purchase_cost'),
+            total_value=Sum('depreciated_value'),
+        ).order_by()
+
+    CategoryValuationSnapshot.objects.filter(date=as_of).delete()
+    CategoryValuationSnapshot.objects.bulk_create([
+        CategoryValuationSnapshot(
+            date=as_of,
+            category_id=total['category'],
+            item_count=total['item_count'],
+            purchase_cost=total['total_cost'],
+            depreciated_value=total['total_value'],
+        )
+        for total in totals
+    ])
@@ -1,7 +1,6 @@
-import calendar
-from datetime import date, datetime
+import calendar, csv, io, tempfile
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
-import math
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
@@ -12,24 +11,44 @@ from django.db.models import (
     Case, 
     When, 
     Exists, 
-    Sum,
+    Subquery,
     F,
     ExpressionWrapper,
     FloatField
 )
+from django.db import IntegrityError
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 from django.contrib.auth.decorators import login_required, permission_required
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.core.exceptions import ObjectDoesNotExist
 from django.contrib import messages
-from django.http import HttpResponseNotAllowed
+from django.http import FileResponse, HttpResponseNotAllowed, JsonResponse
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
-from .models import Item, EquipmentBooking, EquipmentBookingItem
+from .models import Item, Kit, EquipmentBooking, EquipmentBookingItem, CategoryValuationSnapshot
 from . import filters
 from . import forms
-from .utils import get_cached_equipment_filterables, has_pending_booking
-from core.utils import get_date_periods, convert_duration_to_hours
+from .exports import export_items_csv, export_bookings_csv
+from .imports import import_items
+from .invoices import (
+    MAX_INVOICE_BATCH,
+    allocate_invoice_numbers, 
+    get_invoices, 
+    write_invoice_pdfs, 
+    write_invoices_zip,
+)
+from .pricing import get_booking_costs
+from .utils import (
+    get_cached_equipment_filterables, 
+    get_booking_calendar, 
+    get_load_level, 
+    get_booking_timeline, 
+    get_timeline_window, 
+    get_pending_booking, 
+    set_item_availability,
+    split_references,
+    TIMELINE_SCALES,
+)
+from core.pagination import CursorPaginator, paginate
 
 
 @login_required
@@ -49,12 +68,10 @@ def equipment_dashboard_view(request):
         ).filter(status='CONFIRMED').order_by('-created_at')[0:10]
 
     context = {
-        'pending_booking': has_pending_booking(request.user),
         'todays_bookings': todays_bookings,
         'recent_bookings': recent_bookings,
     }
     context.update(get_cached_equipment_filterables())
-    context.update(get_date_periods())
 
     return render(request, 'equipment/dashboard.html', context)
 
@@ -66,69 +83,53 @@ def item_query_view(request):
     Query / search all equipment.
     """    
 
-    pending_booking = has_pending_booking(request.user)
+    pending_booking = get_pending_booking(request)
 
-    if pending_booking:
-        booking_start = pending_booking.start_at
-        booking_end = pending_booking.end_at
-        
-        # Subquery to check if the item is booked during the current active booking period
-        booked_items_subquery = EquipmentBookingItem.objects.filter(
-            item=OuterRef('pk'),
-            equipment_booking__start_at__lt=booking_end,
-            equipment_booking__end_at__gt=booking_start,
-            equipment_booking__status__in=['PENDING', 'CONFIRMED'],
-        )
+    if request.GET.get('show') == 'kits':
+        return kit_query(request, pending_booking)
 
-        # Annotate the queryset with availability status
-        items = Item.objects.select_related('manufacturer', 'category', 'assigned_to'
-            ).filter(deleted=False
-            ).annotate(
-                available=Case(
-                    When(
-                        Exists(booked_items_subquery), then=Value(False)  # Mark as unavailable if booked
-                    ),
-                    When(
-                        assigned_to__isnull=False, then=Value(False)  # Mark as unavailable if assigned
-                    ),
-                    default=Value(True),  # Otherwise, mark as available
-                    output_field=BooleanField()
-                )
-            ).order_by('created_at')
-    else:
-        # If no active booking exists, set all items as available
-        items = Item.objects.select_related('manufacturer', 'category', 'assigned_to'
-            ).filter(deleted=False
-            ).annotate(
-                available=Case(
-                    When(assigned_to__isnull=True, then=Value(True)),  # Available if not assigned
-                    default=Value(False),  # Unavailable if assigned
-                    output_field=BooleanField()
-                )
-            ).order_by('created_at')
+    # Availability is resolved per page below, rather than annotated across 
+    # the whole catalogue.
+    items = Item.objects.select_related('manufacturer', 'category', 'assigned_to'
+        ).filter(deleted=False)
         
     equipment_filter = filters.ItemFilter(request.GET, queryset=items)
 
-    paginator = Paginator(equipment_filter.qs, 40)
-    page = request.GET.get('page')
+    if request.GET.get('format') == 'csv':
+        return export_items_csv(equipment_filter.qs, pending_booking)
 
-    try:
-        item_query = paginator.page(page)
-    except PageNotAnInteger:
-        item_query = paginator.page(1)
-    except EmptyPage:
-        item_query = paginator.page(paginator.num_pages)     
+    item_query = paginate(request, equipment_filter.qs, 40, ['created_at'])
+
+    item_query.object_list = set_item_availability(item_query.object_list, pending_booking)
 
     context = {
         'item_query': item_query,
         'pending_booking': pending_booking,
     }
     context.update(get_cached_equipment_filterables())
-    context.update(get_date_periods())
 
     return render(request, 'equipment/item-query.html', context)
 
 
+def kit_query(request, pending_booking):
+    """
+    Lists kits for the item query, with each kit's availability for the 
+    pending booking counted in the same query.
+    """
+
+    kits = Kit.objects.with_availability(pending_booking.period if pending_booking else None)
+
+    if request.GET.get('search'):
+        kits = kits.filter(name__icontains=request.GET['search'])
+
+    context = {
+        'kit_query': paginate(request, kits, 40, ['name', 'id']),
+        'pending_booking': pending_booking,
+    }
+
+    return render(request, 'equipment/kit-query.html', context)
+
+
 @login_required
 @permission_required('equipment.view_item', raise_exception=True)
 def item_detail_view(request, pk):
@@ -140,10 +141,10 @@ def item_detail_view(request, pk):
             'assigned_to', 
             'category', 
             'manufacturer',
-        ), 
+        ).with_depreciated_value(), 
         id=pk,
     )
-    item.depreciated_value = round(item.calculate_depreciation(), 2)
+    item.depreciated_value = round(item.depreciated_value, 2)
 
     now = timezone.now()
     upcoming_bookings = EquipmentBooking.objects.select_related('created_by'
@@ -162,6 +163,119 @@ def item_detail_view(request, pk):
 
 
 
+@login_required
+@permission_required('equipment.view_item', raise_exception=True)
+def item_scan_view(request):
+    """
+    Resolves one or more scanned barcodes to their items and current 
+    availability, in a single query. Barcodes can be repeated or comma 
+    separated, i.e. ?barcode=123&barcode=456 or ?barcode=123,456.
+    """
+
+    max_barcodes = 200
+
+    barcodes = split_references(request.GET.getlist('barcode'))
+
+    if not barcodes:
+        return JsonResponse({'error': 'At least one barcode is required.'}, status=400)
+
+    if len(barcodes) > max_barcodes:
+        return JsonResponse({'error': f'No more than {max_barcodes} barcodes can be scanned at once.'}, status=400)
+
+    # Booking currently holding the item, if any
+    current_booking_subquery = EquipmentBookingItem.objects.active(
+        ).filter(item=OuterRef('pk'), period__contains=timezone.now()
+        ).values('equipment_booking__job_reference')[:1]
+
+    items = Item.objects.filter(barcode__in=barcodes, deleted=False
+        ).annotate(current_booking=Subquery(current_booking_subquery)
+        ).values('id', 'barcode', 'name', 'status', 'assigned_to', 'current_booking')
+
+    found = []
+    for item in items:
+        item['available'] = item['assigned_to'] is None and item['current_booking'] is None
+        found.append(item)
+
+    found_barcodes = {item['barcode'] for item in found}
+
+    return JsonResponse({
+        'items': found,
+        'not_found': [barcode for barcode in barcodes if barcode not in found_barcodes],
+    })
+
+
+@login_required
+@permission_required('equipment.view_item', raise_exception=True)
+def item_availability_view(request):
+    """
+    Finds a number of free items of a category and / or manufacturer for a 
+    window, in a single query. The window defaults to the user's pending 
+    booking. POSTing adds the items found for the pending booking to it, with 
+    a single insert.
+    """
+
+    data = request.POST if request.method == 'POST' else request.GET
+    form = forms.ItemAvailabilityForm(data)
+
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    start_at = form.cleaned_data['start_at']
+    end_at = form.cleaned_data['end_at']
+
+    if request.method == 'POST':
+        if not request.user.has_perm('equipment.add_equipmentbooking'):
+            return JsonResponse({'error': 'You do not have permission to add to bookings.'}, status=403)
+
+        pending_booking = get_pending_booking(request)
+        if not pending_booking:
+            return JsonResponse({'error': 'There is no pending booking to add items to.'}, status=400)
+
+        # Items are added for the booking's own period
+        start_at, end_at = pending_booking.start_at, pending_booking.end_at
+
+    elif not (start_at and end_at):
+        pending_booking = get_pending_booking(request)
+        if not pending_booking:
+            return JsonResponse({'error': 'A window start and end, or a pending booking, is required.'}, status=400)
+
+        start_at, end_at = pending_booking.start_at, pending_booking.end_at
+
+    items = Item.objects.available(DateTimeTZRange(start_at, end_at, '[)'))
+    for field in ('category', 'manufacturer'):
+        if form.cleaned_data[field]:
+            items = items.filter(**{field: form.cleaned_data[field]})
+
+    quantity = form.cleaned_data['quantity']
+    items = list(items.order_by('name', 'id')[:quantity])
+
+    added = False
+    if request.method == 'POST' and items:
+        try:
+            # The exclusion constraint catches anything booked since the search
+            pending_booking.add_items(items)
+            added = True
+        except IntegrityError:
+            return JsonResponse({'error': 'Some of these items have just been booked, please search again.'}, status=409)
+
+    return JsonResponse({
+        'start_at': start_at.isoformat(),
+        'end_at': end_at.isoformat(),
+        'requested': quantity,
+        'shortfall': quantity - len(items),
+        'added': added,
+        'items': [
+            {
+                'id': str(item.pk),
+                'name': item.name,
+                'barcode': item.barcode,
+                'hire_day_rate': item.hire_day_rate,
+            }
+            for item in items
+        ],
+    })
+
+
 @login_required
 @permission_required('equipment.add_item', raise_exception=True)
 def create_item_view(request):
@@ -188,6 +302,40 @@ def create_item_view(request):
     return render(request, 'equipment/create-item.html', context)
 
 
+@login_required
+@permission_required('equipment.add_item', raise_exception=True)
+def import_items_view(request):
+    """
+    Bulk creates items from an uploaded CSV file, reporting any rows that 
+    could not be imported.
+    """
+
+    form = forms.UploadItemsForm()
+    import_errors = None
+
+    if request.method == 'POST':
+        form = forms.UploadItemsForm(request.POST, request.FILES)
+
+        if form.is_valid():
+            csv_file = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+
+            try:
+                created, import_errors = import_items(csv.DictReader(csv_file), created_by=request.user)
+            except (csv.Error, UnicodeDecodeError):
+                form.add_error('file', 'The file could not be read as CSV.')
+            else:
+                messages.success(request, f'Successfully imported {created} items.')
+
+                if not import_errors:
+                    return redirect(reverse('equipment_item_query'))
+
+    context = {
+        'form': form,
+        'import_errors': import_errors,
+    }
+    return render(request, 'equipment/import-items.html', context)
+
+
 @login_required
 @permission_required('equipment.change_item', raise_exception=True)
 def update_item_view(request, pk):
@@ -328,39 +476,69 @@ def add_to_booking_view(request, pk):
         # Predefine next url so it can be used in both success and error blocks
         next = request.POST.get('next', reverse('equipment_item_query'))
         
-        try:            
-            pending_booking = EquipmentBooking.objects.get(
-                created_by=request.user, 
-                status='PENDING'
-            )
-
-            booking_start = pending_booking.start_at
-            booking_end = pending_booking.end_at
+        pending_booking = get_pending_booking(request)
 
+        if pending_booking:
             item = get_object_or_404(Item, id=pk)
 
-            if not item.assigned_to and not EquipmentBookingItem.objects.filter(
-                item=item,
-                equipment_booking__start_at__lt=booking_end,
-                equipment_booking__end_at__gt=booking_start,
-                equipment_booking__status='CONFIRMED',
-            ).exists():
-                booking_item, created = EquipmentBookingItem.objects.get_or_create(
-                    equipment_booking=pending_booking,
-                    item=item,
-                )
+            if not item.assigned_to and not EquipmentBookingItem.objects.active(
+                ).overlapping(pending_booking.period
+                ).filter(item=item
+                ).exclude(equipment_booking=pending_booking
+                ).exists():
+                try:
+                    # The exclusion constraint catches anything booked since the check above
+                    booking_item, created = EquipmentBookingItem.objects.get_or_create(
+                        equipment_booking=pending_booking,
+                        item=item,
+                    )
+                except IntegrityError:
+                    messages.error(request, 'This item cannot currently be booked.')
             else:
                 messages.error(request, 'This item cannot currently be booked.')
 
             return redirect(next)
 
-        except ObjectDoesNotExist:
+        else:
             return redirect(f"{reverse('equipment_booking_summary')}?next={next}")
 
     else:
         return HttpResponseNotAllowed(['POST'])
     
 
+@login_required
+@permission_required('equipment.add_equipmentbooking', raise_exception=True)
+def add_kit_to_booking_view(request, pk):
+    """
+    Adds all of a kit's items to the pending booking with a single insert, 
+    if the whole kit is available.
+    """
+
+    if request.method == 'POST':
+
+        next = request.POST.get('next', f"{reverse('equipment_item_query')}?show=kits")
+
+        pending_booking = get_pending_booking(request)
+        if not pending_booking:
+            return redirect(f"{reverse('equipment_booking_summary')}?next={next}")
+
+        kit = get_object_or_404(Kit.objects.with_availability(pending_booking.period), id=pk)
+
+        if kit.available:
+            try:
+                # The exclusion constraint catches anything booked since the check above
+                kit.add_to_booking(pending_booking)
+            except IntegrityError:
+                messages.error(request, 'This kit cannot currently be booked.')
+        else:
+            messages.error(request, 'This kit cannot currently be booked.')
+
+        return redirect(next)
+
+    else:
+        return HttpResponseNotAllowed(['POST'])
+
+
 @login_required
 @permission_required('equipment.add_equipmentbooking', raise_exception=True)
 def remove_from_booking_view(request, pk):
@@ -380,6 +558,141 @@ def remove_from_booking_view(request, pk):
         return HttpResponseNotAllowed(['POST'])
 
 
+MAX_BULK_ITEMS = 200
+
+
+def get_bulk_items(request, pending_booking):
+    """
+    Returns the references POSTed for a bulk change, as item ids and / or 
+    barcodes, and the items they match with their state in the pending 
+    booking, fetched in one query. Returns an error response instead if the 
+    references are missing or too many.
+    """
+
+    references = split_references(request.POST.getlist('item'))
+
+    if not references:
+        return None, None, JsonResponse({'error': 'At least one item id or barcode is required.'}, status=400)
+
+    if len(references) > MAX_BULK_ITEMS:
+        return None, None, JsonResponse({'error': f'No more than {MAX_BULK_ITEMS} items can be changed at once.'}, status=400)
+
+    items = {}
+    for item in Item.objects.by_reference(references).filter(deleted=False).with_booking_state(pending_booking):
+        items[str(item.pk)] = item
+        if item.barcode:
+            items[item.barcode] = item
+
+    return references, items, None
+
+
+def bulk_item_result(reference, item, result):
+    return {
+        'reference': reference,
+        'item': str(item.pk) if item else None,
+        'name': item.name if item else None,
+        'result': result,
+    }
+
+
+@login_required
+@permission_required('equipment.add_equipmentbooking', raise_exception=True)
+def bulk_add_to_booking_view(request):
+    """
+    Adds a list of items, by id or barcode, to the user's pending booking. 
+    Availability is checked for all of them in one query, and the available 
+    items are added in a single insert, returning the result for each item.
+    """
+
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    pending_booking = get_pending_booking(request)
+    if not pending_booking:
+        return JsonResponse({'error': 'There is no pending booking to add items to.'}, status=400)
+
+    references, items, error = get_bulk_items(request, pending_booking)
+    if error:
+        return error
+
+    results = []
+    to_add = {}
+    for reference in references:
+        item = items.get(reference)
+
+        if not item:
+            result = 'not_found'
+        elif item.in_booking or item.pk in to_add:
+            result = 'in_booking'
+        elif item.assigned_to_id or item.booked:
+            result = 'unavailable'
+        else:
+            result = 'added'
+            to_add[item.pk] = item
+
+        results.append(bulk_item_result(reference, item, result))
+
+    status = 200
+    if to_add:
+        try:
+            # The exclusion constraint catches anything booked since the check
+            # above, in which case none of the items are added
+            pending_booking.add_items(to_add.values())
+        except IntegrityError:
+            status = 409
+            for result in results:
+                if result['result'] == 'added':
+                    result['result'] = 'conflict'
+
+    return JsonResponse({
+        'added': len(to_add) if status == 200 else 0,
+        'results': results,
+    }, status=status)
+
+
+@login_required
+@permission_required('equipment.add_equipmentbooking', raise_exception=True)
+def bulk_remove_from_booking_view(request):
+    """
+    Removes a list of items, by id or barcode, from the user's pending 
+    booking with a single delete, returning the result for each item.
+    """
+
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    pending_booking = get_pending_booking(request)
+    if not pending_booking:
+        return JsonResponse({'error': 'There is no pending booking to remove items from.'}, status=400)
+
+    references, items, error = get_bulk_items(request, pending_booking)
+    if error:
+        return error
+
+    results = []
+    to_remove = {}
+    for reference in references:
+        item = items.get(reference)
+
+        if not item:
+            result = 'not_found'
+        elif not item.in_booking:
+            result = 'not_in_booking'
+        else:
+            result = 'removed'
+            to_remove[item.pk] = item
+
+        results.append(bulk_item_result(reference, item, result))
+
+    if to_remove:
+        pending_booking.remove_items(list(to_remove))
+
+    return JsonResponse({
+        'removed': len(to_remove),
+        'results': results,
+    })
+
+
 @login_required
 @permission_required('equipment.add_equipmentbooking', raise_exception=True)
 def booking_summary_view(request):
@@ -388,22 +701,17 @@ def booking_summary_view(request):
     have one, create one.
     """
 
-    try:
-        pending_booking = EquipmentBooking.objects.get(
-            created_by=request.user, 
-            status='PENDING'
-        )
+    # Checked against the database, as a booking is created if there is none
+    pending_booking = get_pending_booking(request, cached=False)
+
+    if pending_booking:
 
-        booking_start = pending_booking.start_at
-        booking_end = pending_booking.end_at
-        
         # Subquery to check if the item is booked during the current active booking period
-        booked_items_subquery = EquipmentBookingItem.objects.filter(
-            item=OuterRef('item__pk'),
-            equipment_booking__start_at__lt=booking_end,
-            equipment_booking__end_at__gt=booking_start,
-            equipment_booking__status='CONFIRMED'
-        )
+        booked_items_subquery = EquipmentBookingItem.objects.overlapping(pending_booking.period
+            ).filter(
+                item=OuterRef('item__pk'),
+                equipment_booking__status='CONFIRMED',
+            )
         
         booking_items = EquipmentBookingItem.objects.select_related(
             'item', 
@@ -423,8 +731,7 @@ def booking_summary_view(request):
         
         form = None
 
-    except ObjectDoesNotExist:
-        pending_booking = None
+    else:
         booking_items = None
         form = forms.CreateUpdateBookingForm()
 
@@ -444,7 +751,6 @@ def booking_summary_view(request):
         'form': form
     }
     context.update(get_cached_equipment_filterables())
-    context.update(get_date_periods())
     
     return render(request, 'equipment/booking-summary.html', context)
 
@@ -519,12 +825,8 @@ def booking_summary_cancel_view(request):
 @permission_required('equipment.change_equipmentbooking', raise_exception=True)
 def booking_update_view(request, pk):
 
-    open_pending_bookings = EquipmentBooking.objects.filter(
-        created_by=request.user, 
-        status='PENDING'
-    )
-
-    if not open_pending_bookings.exists():
+    # Checked against the database, as the booking is reopened if there is none
+    if not get_pending_booking(request, cached=False):
 
         booking = get_object_or_404(EquipmentBooking, id=pk)
 
@@ -552,7 +854,12 @@ def booking_update_meta_view(request, pk):
         form = forms.CreateUpdateBookingForm(request.POST, instance=booking)
 
         if form.is_valid():
-            form.save()
+            try:
+                form.save()
+            except IntegrityError:
+                messages.error(request, 'One or more items is already booked for that period.')
+                return redirect('equipment_booking_summary')
+
             messages.success(request, 'Booking details successfully updated.')
             return redirect('equipment_booking_summary')
         
@@ -599,27 +906,18 @@ def booking_query_view(request):
 
     bookings = EquipmentBooking.objects.select_related(
         'created_by',
-        ).all().exclude(status='PENDING').order_by('-start_at', 'created_at')
+        ).all().exclude(status='PENDING')
 
     booking_filter = filters.EquipmentBookingFilter(request.GET, queryset=bookings)
 
-    paginator = Paginator(booking_filter.qs, 40)
-    page = request.GET.get('page')
-
-    try:
-        booking_query = paginator.page(page)
-    except PageNotAnInteger:
-        booking_query = paginator.page(1)
-    except EmptyPage:
-        booking_query = paginator.page(paginator.num_pages)       
+    if request.GET.get('format') == 'csv':
+        return export_bookings_csv(booking_filter.qs)
 
-    pending_booking = has_pending_booking(request.user)
+    booking_query = paginate(request, booking_filter.qs, 40, ['-start_at', 'created_at'])
 
     context = {
         'booking_query': booking_query,
-        'pending_booking': pending_booking,
     }
-    context.update(get_date_periods())
     context.update(get_cached_equipment_filterables())
 
     return render(request, 'equipment/booking-query.html', context)
@@ -645,11 +943,9 @@ def booking_calendar_view(request):
     # Get the weeks of the current month (as lists of day numbers)
     month_weeks = cal.monthdayscalendar(target_year, target_month)
 
-    # Fetch bookings that occur within the target month
-    bookings = EquipmentBooking.objects.filter(start_at__year=target_year, start_at__month=target_month, status="CONFIRMED")
-
-    # Organize bookings into a set of days for fast lookup
-    booking_days = {booking.start_at.day for booking in bookings}
+    # Bookings and items out per day, including every day a booking spans
+    booking_calendar = get_booking_calendar(target_year, target_month)
+    busiest_day_items = max([load['items'] for load in booking_calendar.values()], default=0)
 
     # Initialize the month dictionary to store weeks and days
     month_obj = {}
@@ -661,7 +957,10 @@ def booking_calendar_view(request):
                 day_num: {
                     'day': day,
                     'date': (day_date := date(target_year, target_month, day)).strftime('%Y-%m-%d') if day != 0 else None,  # Include full date
-                    'has_booking': day in booking_days and day != 0,  # Mark if the day has a booking
+                    'has_booking': (bookings := booking_calendar.get(day, {}).get('bookings', 0)) > 0,  # Mark if the day has a booking
+                    'bookings': bookings,
+                    'items': (items := booking_calendar.get(day, {}).get('items', 0)),
+                    'load': get_load_level(items, busiest_day_items),  # Heatmap level, relative to the busiest day
                     'is_today': day_date == today if day != 0 else False  # Check if the date is today
                 }
                 for day_num, day in enumerate(week, start=1)  # Start from 1 for weekday numbering
@@ -679,10 +978,7 @@ def booking_calendar_view(request):
     prev_month = prev_month_date.strftime('%Y-%m')
     next_month = next_month_date.strftime('%Y-%m')
 
-    pending_booking = has_pending_booking(request.user)     
-
     context = {
-        'pending_booking': pending_booking,
         'month_obj': month_obj,
         'month_name': calendar.month_name[target_month],
         'year_name': target_year,
@@ -694,6 +990,76 @@ def booking_calendar_view(request):
     return render(request, 'equipment/booking-calendar.html', context)
 
 
+@login_required
+@permission_required('equipment.view_equipmentbooking', raise_exception=True)
+def booking_timeline_view(request):
+    """
+    Per item timeline of bookings across a week or a day. Rows are loaded 
+    from booking_timeline_data_view a page at a time, as the user scrolls.
+    """
+
+    scale, start_date, window_start, window_end = get_timeline_window(
+        request.GET.get('scale'), 
+        request.GET.get('start'),
+    )
+    step = timedelta(days=TIMELINE_SCALES[scale])
+
+    context = {
+        'scale': scale,
+        'start_date': start_date,
+        'window_start': window_start,
+        'window_end': window_end,
+        'window_days': [start_date + timedelta(days=day) for day in range(step.days)],
+        'window_hours': range(0, 24, 3),
+        'prev_start': start_date - step,
+        'next_start': start_date + step,
+    }
+    context.update(get_cached_equipment_filterables())
+
+    return render(request, 'equipment/booking-timeline.html', context)
+
+
+@login_required
+@permission_required('equipment.view_equipmentbooking', raise_exception=True)
+def booking_timeline_data_view(request):
+    """
+    Returns a page of items, with their booking intervals in the timeline 
+    window, as JSON. Items are keyset paginated by name, so every page costs 
+    one query for the items and one for their bookings.
+    """
+
+    scale, start_date, window_start, window_end = get_timeline_window(
+        request.GET.get('scale'), 
+        request.GET.get('start'),
+    )
+
+    items = Item.objects.select_related('category').filter(deleted=False)
+    items = filters.ItemFilter(request.GET, queryset=items).qs
+
+    page = CursorPaginator(items, 50, ['name']).page(request.GET.get(CursorPaginator.page_param))
+    timeline = get_booking_timeline(page.object_list, window_start, window_end)
+
+    return JsonResponse({
+        'window': {
+            'scale': scale,
+            'start_at': window_start.isoformat(),
+            'end_at': window_end.isoformat(),
+        },
+        'items': [
+            {
+                'id': str(item.pk),
+                'name': item.name,
+                'barcode': item.barcode,
+                'category': str(item.category) if item.category else None,
+                'url': reverse('equipment_item_detail', kwargs={'pk': item.pk}),
+                'bookings': timeline[item.pk],
+            }
+            for item in page
+        ],
+        'next': page.next_page_number(),
+    })
+
+
 @login_required
 @permission_required('equipment.view_equipmentbooking', raise_exception=True)
 def booking_detail_view(request, pk):
@@ -737,33 +1103,25 @@ def booking_cost_view(request, pk):
         ),
         id=pk,
     )
-
-    hours = convert_duration_to_hours(booking.duration.days, booking.duration.seconds)
-    chargeable_days = math.ceil(hours / 24)
+    costs = get_booking_costs(booking)
 
     booking_items = EquipmentBookingItem.objects.select_related(
         'item',
         'item__manufacturer', 
         'item__category'
         ).filter(equipment_booking=booking,).annotate(
-            total=ExpressionWrapper(F('value') * chargeable_days, output_field=FloatField())
+            total=ExpressionWrapper(F('value') * costs['chargeable_days'], output_field=FloatField())
         ).order_by('created_at')
-    
-    sub_total = booking_items.aggregate(Sum('total', default=0.0))['total__sum']
-    vat_percentage = float(booking.vat_value)
-    vat_total = (sub_total/100) * (vat_percentage)
-    total_cost_vat = sub_total + vat_total
-    insure_value = booking_items.aggregate(insure_value=Sum('item__purchase_cost', default=0.0))['insure_value']
 
     context = {
         'booking': booking,
-        'chargeable_days': chargeable_days,
+        'chargeable_days': costs['chargeable_days'],
         'booking_items': booking_items,
-        'sub_total': sub_total,
-        'vat_percentage': vat_percentage,
-        'vat_total': vat_total,
-        'total_cost_vat': total_cost_vat,
-        'insure_value': insure_value,
+        'sub_total': costs['sub_total'],
+        'vat_percentage': float(booking.vat_value),
+        'vat_total': costs['vat_total'],
+        'total_cost_vat': costs['total'],
+        'insure_value': costs['insured_value'],
     }
 
     return render(request, 'equipment/booking-cost.html', context)
@@ -772,6 +1130,10 @@ def booking_cost_view(request, pk):
 @login_required
 @permission_required('equipment.view_equipmentbooking', raise_exception=True)
 def booking_invoice_view(request, pk):
+    """
+    Printable invoice for a booking, or a PDF with `format=pdf`. PDFs are 
+    cached until anything printed on the invoice changes.
+    """
     
     booking = get_object_or_404(
         EquipmentBooking.objects.select_related(
@@ -781,31 +1143,153 @@ def booking_invoice_view(request, pk):
         id=pk,
     )
 
-    hours = convert_duration_to_hours(booking.duration.days, booking.duration.seconds)
-    chargeable_days = math.ceil(hours / 24)
+    costs = get_booking_costs(booking)
 
     booking_items = EquipmentBookingItem.objects.select_related(
         'item',
         'item__manufacturer', 
         'item__category'
         ).filter(equipment_booking=booking,).annotate(
-            total=ExpressionWrapper(F('value') * chargeable_days, output_field=FloatField())
+            total=ExpressionWrapper(F('value') * costs['chargeable_days'], output_field=FloatField())
         ).order_by('created_at')
-    
-
-    sub_total = booking_items.aggregate(Sum('total', default=0.0))['total__sum']
-    vat_percentage = float(booking.vat_value)
-    vat_total = (sub_total/100) * (vat_percentage)
-    total_cost_vat = sub_total + vat_total
 
     context = {
         'booking': booking,
-        'chargeable_days': chargeable_days,
+        'chargeable_days': costs['chargeable_days'],
         'booking_items': booking_items,
-        'sub_total': sub_total,
-        'vat_percentage': vat_percentage,
-        'vat_total': vat_total,
-        'total_cost_vat': total_cost_vat,
+        'sub_total': costs['sub_total'],
+        'vat_percentage': float(booking.vat_value),
+        'vat_total': costs['vat_total'],
+        'total_cost_vat': costs['total'],
+    }
+
+    if request.GET.get('format') == 'pdf':
+        pdf_path, = write_invoice_pdfs([context], workers=1)
+        try:
+            return invoice_pdf_response(booking, pdf_path)
+        except FileNotFoundError:
+            # Removed before it was opened, i.e. by a render for a newer 
+            # version of the booking, so rendered again
+            pdf_path, = write_invoice_pdfs([context], workers=1)
+            return invoice_pdf_response(booking, pdf_path)
+
+    return render(request, 'equipment/booking-invoice.html', context)
+
+
+def invoice_pdf_response(booking, pdf_path):
+    return FileResponse(
+        open(pdf_path, 'rb'),
+        filename=f'{booking.invoice_number or booking.job_reference}.pdf',
+        content_type='application/pdf',
+    )
+
+
+def get_invoice_bookings(request, data):
+    """
+    Returns the confirmed bookings to invoice, filtered by the given query, 
+    or an error redirect back to the booking query instead. Batches must be 
+    limited to a date range, and to at most MAX_INVOICE_BATCH bookings.
+    """
+
+    bookings = EquipmentBooking.objects.filter(status='CONFIRMED')
+    booking_filter = filters.EquipmentBookingFilter(data, queryset=bookings)
+
+    error = None
+    if not booking_filter.is_valid():
+        error = 'The invoice filters are not valid.'
+    elif not (booking_filter.form.cleaned_data['date_range_start'] and booking_filter.form.cleaned_data['date_range_end']):
+        error = 'Filter the bookings by a start and end date to invoice them.'
+    elif booking_filter.qs.count() > MAX_INVOICE_BATCH:
+        error = f'No more than {MAX_INVOICE_BATCH} bookings can be invoiced at once.'
+
+    if error:
+        messages.error(request, error)
+        return None, redirect(f"{reverse('equipment_booking_query')}?{data.urlencode()}")
+
+    return booking_filter.qs, None
+
+
+@login_required
+@permission_required('equipment.view_equipmentbooking', raise_exception=True)
+def booking_invoices_view(request):
+    """
+    Invoices for the filtered confirmed bookings, as a single printable 
+    document. Bookings are shown as they are, without allocating invoice 
+    numbers, see booking_invoices_issue_view.
+    """
+
+    bookings, error_response = get_invoice_bookings(request, request.GET)
+    if error_response:
+        return error_response
+
+    context = {
+        'invoices': get_invoices(bookings),
+    }
+
+    return render(request, 'equipment/booking-invoices.html', context)
+
+
+@login_required
+@permission_required('equipment.change_equipmentbooking', raise_exception=True)
+def booking_invoices_issue_view(request):
+    """
+    Numbers the filtered confirmed bookings not yet invoiced, and returns a 
+    zip of their invoices, one per booking.
+    """
+
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    bookings, error_response = get_invoice_bookings(request, request.POST)
+    if error_response:
+        return error_response
+
+    allocate_invoice_numbers(bookings)
+    invoices = get_invoices(bookings)
+
+    invoices_file = tempfile.TemporaryFile()
+    write_invoices_zip(invoices, invoices_file)
+    invoices_file.seek(0)
+
+    return FileResponse(
+        invoices_file, 
+        as_attachment=True, 
+        filename=f'invoices-{timezone.localdate()}.zip',
+    )
+
+
+@login_required
+@permission_required('equipment.view_item', raise_exception=True)
+def valuation_report_view(request):
+    """
+    Book value of the fleet by category, read from the latest valuation 
+    snapshot taken on or before the requested date.
+    """
+
+    requested_date = timezone.localdate()
+    try:
+        requested_date = date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        pass
+
+    snapshot_dates = CategoryValuationSnapshot.objects.dates('date', 'day', order='DESC')
+    snapshot_date = snapshot_dates.filter(date__lte=requested_date).first()
+
+    category_totals = CategoryValuationSnapshot.objects.select_related('category'
+        ).filter(date=snapshot_date
+        ).order_by('category__name')
+
+    totals = {'item_count': 0, 'purchase_cost': 0.0, 'depreciated_value': 0.0}
+    for category_total in category_totals:
+        for key in totals:
+            totals[key] += getattr(category_total, key)
+
+    context = {
+        'requested_date': requested_date,
+        'snapshot_date': snapshot_date,
+        'snapshot_dates': snapshot_dates[:24],
+        'category_totals': category_totals,
+        'totals': totals,
     }
 
-    return render(request, 'equipment/booking-invoice.html', context)
\ No newline at end of file
+    return render(request, 'equipment/valuation-report.html', context)